@@ -0,0 +1,109 @@
+# chatbot/answer_cache.py
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    """Case/whitespace/trailing-punctuation insensitive form used for exact hits."""
+    return _WHITESPACE.sub(" ", question.lower()).strip().rstrip("?!. ")
+
+
+class AnswerCache:
+    """
+    Semantic cache of answers per document.
+
+    A question is served from the cache when its normalized text was seen
+    before for the same document, or when the cosine similarity between its
+    embedding and a cached question's is at least `threshold`. Entries are
+    evicted least-recently-used beyond `max_entries` and after `ttl`
+    seconds, and `invalidate(doc_key)` drops a document's answers when it
+    is re-indexed.
+    """
+
+    def __init__(self, max_entries=1000, threshold=0.95, ttl=None):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl = ttl or None
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (doc_key, normalized question) → entry
+        self._by_doc = {}              # doc_key → set of entry keys
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _unit(embedding):
+        vector = np.asarray(embedding, dtype="float32").reshape(-1)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _drop(self, key):
+        self._entries.pop(key, None)
+        doc_keys = self._by_doc.get(key[0])
+        if doc_keys is not None:
+            doc_keys.discard(key)
+            if not doc_keys:
+                del self._by_doc[key[0]]
+
+    def _expired(self, entry):
+        return self.ttl is not None and time.monotonic() - entry["created"] > self.ttl
+
+    def lookup(self, doc_key, question, embedding):
+        """Returns the cached result for an equal or near-duplicate question, or None."""
+        key = (doc_key, normalize_question(question))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry):
+                self._drop(key)
+                entry = None
+            if entry is not None:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return entry["result"]
+
+            candidates = [k for k in self._by_doc.get(doc_key, ()) if not self._expired(self._entries[k])]
+            if candidates:
+                matrix = np.stack([self._entries[k]["embedding"] for k in candidates])
+                similarities = matrix @ self._unit(embedding)
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    self.near_hits += 1
+                    self._entries.move_to_end(candidates[best])
+                    return self._entries[candidates[best]]["result"]
+
+            self.misses += 1
+            return None
+
+    def store(self, doc_key, question, embedding, result):
+        key = (doc_key, normalize_question(question))
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = {
+                "embedding": self._unit(embedding),
+                "result": result,
+                "created": time.monotonic(),
+            }
+            self._by_doc.setdefault(doc_key, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self, doc_key):
+        """Forgets every cached answer for `doc_key`."""
+        with self._lock:
+            for key in list(self._by_doc.get(doc_key, ())):
+                self._drop(key)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+            }
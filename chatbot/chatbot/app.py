@@ -1,57 +1,116 @@
 # chatbot/app.py
 import os
 import time
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash
+import json
+import atexit
+import tempfile
+from datetime import datetime
+from flask import (
+    Flask, Response, render_template, request, jsonify, redirect, url_for, flash, stream_with_context
+)
 from flask_login import (
     LoginManager, login_user, login_required, logout_user, current_user
 )
 from dotenv import load_dotenv
 from sqlalchemy import distinct
 
-# === Chatbot imports ===
-from loader import extract_text_from_pdf
-from embedder import chunk_text, embed_chunks
-from vector_store import VectorStore
-from rag import answer_question
-
 # === Load environment variables ===
+# Before the chatbot imports: their modules read settings at import time.
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 ENV_PATH = os.path.join(BASE_DIR, ".env")
 if os.path.exists(ENV_PATH):
     load_dotenv(dotenv_path=ENV_PATH)
 
+# === Chatbot imports ===
+# Fork the PDF extraction workers first, while this process is still small:
+# before the embedding model, the database and any threads exist.
+from loader import start_extract_pool
+start_extract_pool()
+
+from indexer import DocumentManifest, build_index, file_digest
+from corpus_index import CorpusIndex
+from store_cache import StoreCache
+from answer_cache import AnswerCache
+from embedder import cache as embedding_cache
+from jobs import IndexingJobs, QueueFullError
+from vector_store import VectorStore
+from rag import answer_question, stream_answer_question
+from reranker import CrossEncoderReranker
+from llm_backends import create_backend
+from llm_client import LLMError
+from auth import DEFAULT_HASH_METHOD, HasherBusyError, PasswordHasher, UserCache
+from history_writer import HistoryWriter
+
 # === Initialize Flask app ===
 app = Flask(__name__, static_folder="static", template_folder="templates")
-app.config["UPLOAD_FOLDER"] = os.path.join(BASE_DIR, "test")
+app.config["UPLOAD_FOLDER"] = os.getenv("UPLOAD_FOLDER", os.path.join(BASE_DIR, "test"))
 os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
+app.config["INDEX_FOLDER"] = os.getenv("INDEX_FOLDER", os.path.join(BASE_DIR, "indexes"))
+os.makedirs(app.config["INDEX_FOLDER"], exist_ok=True)
+app.config["RAG_MIN_SCORE"] = float(os.getenv("RAG_MIN_SCORE", "0.2"))
+app.config["RAG_TOP_K"] = int(os.getenv("RAG_TOP_K", "6"))  # candidates offered to the prompt budgeter
+app.config["DOCUMENT_CACHE_MAX_MB"] = int(os.getenv("DOCUMENT_CACHE_MAX_MB", "512"))
+app.config["DOCUMENT_CACHE_TTL"] = int(os.getenv("DOCUMENT_CACHE_TTL", "3600"))  # seconds idle, 0 = never
+app.config["ANSWER_CACHE_SIZE"] = int(os.getenv("ANSWER_CACHE_SIZE", "1000"))
+app.config["ANSWER_CACHE_THRESHOLD"] = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+app.config["ANSWER_CACHE_TTL"] = int(os.getenv("ANSWER_CACHE_TTL", "86400"))  # seconds, 0 = never
+app.config["INDEX_WORKERS"] = int(os.getenv("INDEX_WORKERS", "2"))
+app.config["INDEX_QUEUE_SIZE"] = int(os.getenv("INDEX_QUEUE_SIZE", "16"))
+app.config["RERANK"] = os.getenv("RERANK", "0") == "1"  # cross-encoder re-rank of over-fetched hits
+app.config["LLM_BACKEND"] = os.getenv("LLM_BACKEND", "gemini")  # "gemini" or "stub" (offline load tests)
+app.config["PASSWORD_HASH_METHOD"] = os.getenv("PASSWORD_HASH_METHOD", DEFAULT_HASH_METHOD)  # werkzeug KDF + cost
+app.config["PASSWORD_HASH_WORKERS"] = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+app.config["PASSWORD_HASH_QUEUE"] = int(os.getenv("PASSWORD_HASH_QUEUE", "32"))
+app.config["USER_CACHE_TTL"] = int(os.getenv("USER_CACHE_TTL", "300"))  # seconds
+app.config["HISTORY_QUEUE_SIZE"] = int(os.getenv("HISTORY_QUEUE_SIZE", "10000"))  # pending chat exchanges
+app.config["HISTORY_BATCH_SIZE"] = int(os.getenv("HISTORY_BATCH_SIZE", "200"))  # rows per commit
+app.config["HISTORY_FLUSH_MS"] = int(os.getenv("HISTORY_FLUSH_MS", "200"))
+app.config["HISTORY_PUT_TIMEOUT_MS"] = int(os.getenv("HISTORY_PUT_TIMEOUT_MS", "500"))
+app.config["HISTORY_RETRIES"] = int(os.getenv("HISTORY_RETRIES", "2"))  # before committing exchanges one by one
 
 # === Security & DB Config ===
 app.config["SECRET_KEY"] = "super-secret-key"  # change this before deployment
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///chatbot.db"
+app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv("SQLALCHEMY_DATABASE_URI", "sqlite:///chatbot.db")
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+# Applied once per pooled SQLite connection (see db_setup), not per request
+app.config["SQLITE_SYNCHRONOUS"] = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+app.config["SQLITE_BUSY_TIMEOUT_MS"] = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+app.config["SQLITE_CACHE_SIZE_KB"] = int(os.getenv("SQLITE_CACHE_SIZE_KB", "20000"))
+app.config["SQLITE_MMAP_SIZE_MB"] = int(os.getenv("SQLITE_MMAP_SIZE_MB", "256"))
 
 # ✅ Import db + models
 from models import db, User, ChatMessage
+from db_setup import init_db
 db.init_app(app)
 
-# Enable non-blocking SQLite writes
-@app.before_request
-def set_sqlite_mode():
-    try:
-        db.session.execute("PRAGMA journal_mode=WAL;")
-        db.session.execute("PRAGMA synchronous = NORMAL;")
-    except Exception as e:
-        app.logger.debug(f"SQLite mode setup skipped: {e}")
-
 # === Flask-Login setup ===
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = "login"
 
 
+# Password KDF runs on its own small pool, so login bursts can't take every worker
+PASSWORD_HASHER = PasswordHasher(
+    method=app.config["PASSWORD_HASH_METHOD"],
+    max_workers=app.config["PASSWORD_HASH_WORKERS"],
+    max_pending=app.config["PASSWORD_HASH_QUEUE"],
+)
+
+
+def _load_user_row(user_id):
+    user = User.query.get(user_id)
+    if user is not None:
+        # Detach it so the cached object outlives this request's session
+        db.session.expunge(user)
+    return user
+
+
+USER_CACHE = UserCache(_load_user_row, ttl=app.config["USER_CACHE_TTL"])
+
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return USER_CACHE.get(int(user_id))
 
 
 # ======================================
@@ -71,8 +130,13 @@ def register():
             flash("Username already exists!", "danger")
             return redirect(url_for("register"))
 
-        new_user = User(username=username)
-        new_user.set_password(password)
+        try:
+            password_hash = PASSWORD_HASHER.hash(password)
+        except HasherBusyError as e:
+            flash(str(e), "danger")
+            return redirect(url_for("register"))
+
+        new_user = User(username=username, password_hash=password_hash)
         db.session.add(new_user)
         db.session.commit()
 
@@ -89,7 +153,21 @@ def login():
         password = request.form["password"].strip()
 
         user = User.query.filter_by(username=username).first()
-        if user and user.check_password(password):
+        try:
+            valid = user is not None and PASSWORD_HASHER.verify(user.password_hash, password)
+        except HasherBusyError as e:
+            flash(str(e), "danger")
+            return redirect(url_for("login"))
+
+        if valid:
+            if PASSWORD_HASHER.needs_rehash(user.password_hash):
+                # KDF parameters changed since this hash was made: upgrade it now
+                try:
+                    user.password_hash = PASSWORD_HASHER.hash(password)
+                    db.session.commit()
+                except HasherBusyError:
+                    pass  # keep the old hash; it is upgraded on a later login
+            USER_CACHE.invalidate(user.id)
             login_user(user)
             return redirect(url_for("index"))
         else:
@@ -102,6 +180,7 @@ def login():
 @app.route("/logout")
 @login_required
 def logout():
+    USER_CACHE.invalidate(current_user.id)
     logout_user()
     flash("Logged out successfully.", "success")
     return redirect(url_for("login"))
@@ -111,8 +190,114 @@ def logout():
 # 🤖 CHATBOT CORE
 # ======================================
 
-# In-memory cache for indexed PDFs
-DOCUMENT_STORES = {}
+MANIFEST = DocumentManifest(app.config["INDEX_FOLDER"])
+# Model that writes the answers; the stub needs no network or API key
+LLM = create_backend(app.config["LLM_BACKEND"])
+# Optional second-stage ranking; tuned via RERANK_* environment variables
+RERANKER = CrossEncoderReranker() if app.config["RERANK"] else None
+# One shared index over every loaded document, for "ask across all my files"
+CORPUS = CorpusIndex()
+# Answers to repeated / near-duplicate questions, per document
+ANSWER_CACHE = AnswerCache(
+    max_entries=app.config["ANSWER_CACHE_SIZE"],
+    threshold=app.config["ANSWER_CACHE_THRESHOLD"],
+    ttl=app.config["ANSWER_CACHE_TTL"],
+)
+INDEX_JOBS = IndexingJobs(
+    max_workers=app.config["INDEX_WORKERS"],
+    max_queued=app.config["INDEX_QUEUE_SIZE"],
+    logger=app.logger,
+)
+
+
+def index_dir_for(digest):
+    """Directory holding the persisted VectorStore for a content digest."""
+    return os.path.join(app.config["INDEX_FOLDER"], digest)
+
+
+def load_store(digest):
+    """Loads a persisted VectorStore, or returns None if it was never indexed."""
+    directory = index_dir_for(digest)
+    if not VectorStore.exists(directory):
+        return None
+    app.logger.info(f"Loaded persisted index {digest[:12]}")
+    return VectorStore.load(directory)
+
+
+# In-memory cache for indexed PDFs, keyed by content digest, under a RAM
+# budget; evicted indexes are reloaded from INDEX_FOLDER on the next access
+DOCUMENT_STORES = StoreCache(
+    load_store,
+    max_bytes=app.config["DOCUMENT_CACHE_MAX_MB"] * 1024 * 1024,
+    ttl=app.config["DOCUMENT_CACHE_TTL"],
+    on_evict=CORPUS.remove_document,
+    logger=app.logger,
+)
+
+
+def get_store_by_digest(digest):
+    """
+    Returns the VectorStore for `digest`, loading it from disk if needed.
+    Returns None if no document with these contents was indexed.
+    """
+    return DOCUMENT_STORES.get(digest)
+
+
+def add_to_corpus(digest, store, owner=None):
+    try:
+        CORPUS.add_store(digest, store, owner=owner)
+    except ValueError as e:
+        app.logger.warning(f"Index {digest[:12]} not added to corpus: {e}")
+        return
+    # The corpus copy lives as long as the cached store, so it shares its budget
+    DOCUMENT_STORES.charge(digest, CORPUS.nbytes(digest))
+
+
+def corpus_view_for(user_id):
+    """
+    Returns a search view over every indexed document `user_id` uploaded,
+    pulling documents into the corpus on first use. Documents that do not
+    fit in DOCUMENT_CACHE_MAX_MB together are left out and counted in the
+    view's `skipped`.
+    """
+    indexed = []
+    for digest in MANIFEST.owned(user_id):
+        if INDEX_JOBS.pending(digest):
+            continue
+        # Also marks the store recently used, so it outlives newer loads
+        store = get_store_by_digest(digest)
+        if store is None:
+            continue
+        indexed.append(digest)
+        if digest in CORPUS:
+            CORPUS.add_owner(digest, user_id)
+        else:
+            add_to_corpus(digest, store, owner=user_id)
+    # Loading later documents may have evicted earlier ones (and their corpus copies)
+    skipped = sum(digest not in CORPUS for digest in indexed)
+    if skipped:
+        app.logger.warning(
+            f"Corpus search for user {user_id} covers {len(indexed) - skipped} of {len(indexed)} "
+            f"documents; raise DOCUMENT_CACHE_MAX_MB to search them all"
+        )
+    return CORPUS.view(owner=user_id, skipped=skipped)
+
+
+def run_indexing(job, save_path, digest, filename):
+    """Background job: builds, persists and caches the index for one PDF."""
+    store = build_index(save_path, progress=job.update)
+    store.metadata.update({"digest": digest, "filename": filename})
+    store.save(index_dir_for(digest))
+    DOCUMENT_STORES.put(digest, store)
+    ANSWER_CACHE.invalidate(digest)
+    # Answers cached for "all my files" while this was indexing did not see it;
+    # covers everyone who uploaded these contents meanwhile, not just the first
+    for owner in MANIFEST.owners_of(digest):
+        ANSWER_CACHE.invalidate(f"owner:{owner}")
+    return {
+        "chunk_count": len(store.chunks),
+        "preview": store.metadata.get("preview", ""),
+    }
 
 
 @app.route("/")
@@ -125,7 +310,7 @@ def index():
 @app.route("/upload", methods=["POST"])
 @login_required
 def upload_file():
-    """Handles PDF uploads and builds embeddings."""
+    """Handles PDF uploads and queues them for indexing; returns a job id."""
     if "file" not in request.files:
         return jsonify({"error": "No file part"}), 400
 
@@ -135,32 +320,56 @@ def upload_file():
     if not file.filename.lower().endswith(".pdf"):
         return jsonify({"error": "Only PDF files are allowed"}), 400
 
-    save_path = os.path.join(app.config["UPLOAD_FOLDER"], file.filename)
-    file.save(save_path)
-
-    # 1️⃣ Extract text
-    text = extract_text_from_pdf(save_path)
-
-    # 2️⃣ Chunk text
-    chunks = chunk_text(text, max_length=800)
-
-    # 3️⃣ Embed chunks
-    embeddings = embed_chunks(chunks)
-    dim = embeddings.shape[1]
+    # 1️⃣ Identify the document by content, so re-uploads reuse one index.
+    # The file is stored under its digest, never under its name: a queued job
+    # must not read different bytes uploaded later under the same name.
+    fd, tmp_path = tempfile.mkstemp(suffix=".pdf.part", dir=app.config["UPLOAD_FOLDER"])
+    os.close(fd)
+    file.save(tmp_path)
+    digest = file_digest(tmp_path)
+    save_path = os.path.join(app.config["UPLOAD_FOLDER"], f"{digest}.pdf")
+    os.replace(tmp_path, save_path)
+    MANIFEST.set(current_user.id, file.filename, digest)
+    # "All my files" answers may change once this document joins the set
+    ANSWER_CACHE.invalidate(f"owner:{current_user.id}")
+
+    # 2️⃣ Already indexed → nothing to do
+    store = None if INDEX_JOBS.pending(digest) else get_store_by_digest(digest)
+    if store is not None:
+        job = INDEX_JOBS.completed(
+            digest,
+            {"chunk_count": len(store.chunks), "preview": store.metadata.get("preview", "")},
+            filename=file.filename,
+            deduplicated=True,
+        )
+        return jsonify(job.to_dict()), 200
+
+    # 3️⃣ Extract, chunk, embed and build the index in the background
+    try:
+        job = INDEX_JOBS.submit(
+            digest, run_indexing, save_path, digest, file.filename,
+            filename=file.filename,
+            deduplicated=False,
+        )
+    except QueueFullError as e:
+        return jsonify({"error": str(e)}), 503
 
-    # 4️⃣ Create vector store
-    store = VectorStore(embedding_dim=dim)
-    store.add(chunks, embeddings)
+    data = job.to_dict()
+    data["filename"] = file.filename
+    data["status_url"] = url_for("upload_status", job_id=job.id)
+    return jsonify(data), 202
 
-    # 5️⃣ Save to in-memory dictionary
-    DOCUMENT_STORES[file.filename] = {"store": store, "chunks": chunks}
 
-    return jsonify({
-        "message": f"File {file.filename} uploaded and indexed successfully!",
-        "filename": file.filename,
-        "chunk_count": len(chunks),
-        "preview": text[:800]
-    })
+@app.route("/upload/status/<job_id>")
+@login_required
+def upload_status(job_id):
+    """Reports stage and percentage of a background indexing job."""
+    job = INDEX_JOBS.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job id."}), 404
+    response = jsonify(job.to_dict())
+    response.headers["Cache-Control"] = "no-store"
+    return response
 
 
 # ======================================
@@ -169,7 +378,72 @@ def upload_file():
 # ======================================
 # 💬 FIXED CHAT ROUTE — Instant Response + Async DB Save
 # ======================================
-import threading
+def write_chat_rows(rows):
+    """Inserts a batch of ChatMessage rows in one transaction (history writer thread)."""
+    with app.app_context():
+        try:
+            db.session.add_all(ChatMessage(**row) for row in rows)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+
+# One background writer group-commits chat history; drained on shutdown
+HISTORY_WRITER = HistoryWriter(
+    write_chat_rows,
+    max_queue=app.config["HISTORY_QUEUE_SIZE"],
+    batch_size=app.config["HISTORY_BATCH_SIZE"],
+    flush_interval=app.config["HISTORY_FLUSH_MS"] / 1000,
+    put_timeout=app.config["HISTORY_PUT_TIMEOUT_MS"] / 1000,
+    retries=app.config["HISTORY_RETRIES"],
+    logger=app.logger,
+)
+atexit.register(HISTORY_WRITER.close)
+
+
+def save_chat_async(user_id, filename, question, answer):
+    """Queues the question/answer pair for the history writer without holding up the response."""
+    now = datetime.utcnow()
+    HISTORY_WRITER.submit([
+        {"user_id": user_id, "filename": filename, "role": "user", "message": question, "timestamp": now},
+        {"user_id": user_id, "filename": filename, "role": "assistant", "message": answer, "timestamp": now},
+    ])
+
+
+def resolve_chat_request(data):
+    """
+    Validates a chat request body.
+    Returns (filename, question, store, cache_key, None) on success,
+    or (None, None, None, None, error response) otherwise.
+    """
+    filename = data.get("filename")
+    question = data.get("question", "").strip()
+
+    if data.get("scope") == "all":
+        # Search every document this user uploaded through the shared corpus
+        filename = None
+        store = corpus_view_for(current_user.id)
+        # Don't cache answers drawn from only part of the documents
+        cache_key = None if store.skipped else f"owner:{current_user.id}"
+    else:
+        digest = MANIFEST.get(current_user.id, filename) if filename else None
+        job = INDEX_JOBS.pending(digest) if digest else None
+        if job is not None:
+            return None, None, None, None, (jsonify({
+                "error": "This document is still being indexed. Try again in a moment.",
+                "job_id": job.id,
+                "percent": job.percent,
+            }), 409)
+
+        store = get_store_by_digest(digest) if digest else None
+        if store is None:
+            return None, None, None, None, (jsonify({"error": "Unknown filename. Upload and index the PDF first."}), 400)
+        cache_key = digest
+    if not question:
+        return None, None, None, None, (jsonify({"error": "Question is empty."}), 400)
+    return filename, question, store, cache_key, None
+
 
 @app.route("/chat", methods=["POST"])
 @login_required
@@ -179,56 +453,35 @@ def chat():
     if not data:
         return jsonify({"error": "No JSON body provided"}), 400
 
-    filename = data.get("filename")
-    question = data.get("question", "").strip()
-
-    if not filename or filename not in DOCUMENT_STORES:
-        return jsonify({"error": "Unknown filename. Upload and index the PDF first."}), 400
-    if not question:
-        return jsonify({"error": "Question is empty."}), 400
+    filename, question, store, cache_key, error = resolve_chat_request(data)
+    if error:
+        return error
 
     start_time = time.time()
-    store = DOCUMENT_STORES[filename]["store"]
 
     try:
         # === Generate Answer (main task)
-        result = answer_question(question, store, top_k=3)
+        result = answer_question(
+            question, store, top_k=app.config["RAG_TOP_K"], min_score=app.config["RAG_MIN_SCORE"],
+            cache=ANSWER_CACHE if cache_key else None, cache_key=cache_key, backend=LLM, reranker=RERANKER,
+        )
         answer = result.get("answer", "")
         context_used = result.get("context_used", [])
+        citations = result.get("citations", [])
 
         # === Save Chat Messages Asynchronously ===
-        def save_chat_async(user_id, filename, question, answer):
-            with app.app_context():
-                try:
-                    user_msg = ChatMessage(
-                        user_id=user_id,
-                        filename=filename,
-                        role="user",
-                        message=question
-                    )
-                    bot_msg = ChatMessage(
-                        user_id=user_id,
-                        filename=filename,
-                        role="assistant",
-                        message=answer
-                    )
-                    db.session.add_all([user_msg, bot_msg])
-                    db.session.commit()
-                except Exception as e:
-                    db.session.rollback()
-                    app.logger.error(f"Background DB save failed: {e}")
-
-        threading.Thread(
-            target=save_chat_async,
-            args=(current_user.id, filename, question, answer),
-            daemon=True
-        ).start()
+        save_chat_async(current_user.id, filename, question, answer)
 
         # === Return answer immediately (no waiting for DB)
         elapsed = round(time.time() - start_time, 2)
         response = jsonify({
             "answer": answer,
             "context_used": context_used,
+            "citations": citations,
+            "cached": result.get("cached", False),
+            "context_tokens": result.get("context_tokens", 0),
+            "prompt_tokens": result.get("prompt_tokens", 0),
+            "documents_skipped": getattr(store, "skipped", 0),
             "elapsed_time": elapsed
         })
         response.headers["Cache-Control"] = "no-store"
@@ -237,11 +490,68 @@ def chat():
         print(f"✅ Responded instantly in {elapsed}s")
         return response, 200
 
+    except LLMError as e:
+        app.logger.warning(f"LLM unavailable: {e}")
+        return jsonify({"error": f"The language model is unavailable right now: {e}"}), 503
     except Exception as e:
         app.logger.exception(f"Chat error: {e}")
         return jsonify({"error": str(e)}), 500
 
 
+def sse(event, data):
+    """Formats one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.route("/chat/stream", methods=["POST"])
+@login_required
+def chat_stream():
+    """
+    Streaming chat over Server-Sent Events: a `context` event once retrieval
+    is done, `token` events as the answer is generated, then `done`.
+    """
+    data = request.get_json()
+    if not data:
+        return jsonify({"error": "No JSON body provided"}), 400
+
+    filename, question, store, cache_key, error = resolve_chat_request(data)
+    if error:
+        return error
+
+    user_id = current_user.id
+    start_time = time.time()
+
+    def events():
+        try:
+            for event, payload in stream_answer_question(
+                question, store, top_k=app.config["RAG_TOP_K"], min_score=app.config["RAG_MIN_SCORE"],
+                cache=ANSWER_CACHE if cache_key else None, cache_key=cache_key, backend=LLM, reranker=RERANKER,
+            ):
+                if event == "done":
+                    save_chat_async(user_id, filename, question, payload["answer"])
+                    payload = {
+                        "answer": payload["answer"],
+                        "cached": payload.get("cached", False),
+                        "context_tokens": payload.get("context_tokens", 0),
+                        "prompt_tokens": payload.get("prompt_tokens", 0),
+                        "documents_skipped": getattr(store, "skipped", 0),
+                        "elapsed_time": round(time.time() - start_time, 2),
+                    }
+                yield sse(event, payload)
+        except LLMError as e:
+            app.logger.warning(f"LLM unavailable: {e}")
+            yield sse("error", {"error": f"The language model is unavailable right now: {e}"})
+        except Exception as e:
+            app.logger.exception(f"Chat stream error: {e}")
+            yield sse("error", {"error": str(e)})
+
+    response = Response(stream_with_context(events()), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-store"
+    # Stop reverse proxies (nginx) from buffering the stream
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
 
 # ======================================
 # 📁 USER FILES & HISTORY
@@ -265,7 +575,7 @@ def get_chat_history(filename):
     """Return previous chat messages for this user and specific file."""
     messages = (
         ChatMessage.query.filter_by(user_id=current_user.id, filename=filename)
-        .order_by(ChatMessage.timestamp.asc())
+        .order_by(ChatMessage.timestamp.asc(), ChatMessage.id.asc())
         .all()
     )
     history = [
@@ -276,19 +586,33 @@ def get_chat_history(filename):
 
 
 # ======================================
-# 🧩 DB INIT
+# 📊 METRICS
 # ======================================
-_db_initialized = False
+@app.route("/metrics")
+@login_required
+def metrics():
+    """Cache and index statistics for this worker."""
+    return jsonify({
+        "document_cache": DOCUMENT_STORES.stats(),
+        "embedding_cache": embedding_cache.stats(),
+        "answer_cache": ANSWER_CACHE.stats(),
+        "llm": {"backend": LLM.name},
+        "password_hasher": PASSWORD_HASHER.stats(),
+        "user_cache": USER_CACHE.stats(),
+        "history_writer": HISTORY_WRITER.stats(),
+        "reranker": RERANKER.stats() if RERANKER is not None else None,
+        "corpus": {
+            "documents": len(CORPUS),
+            "vectors": CORPUS.index.ntotal if CORPUS.index is not None else 0,
+        },
+    })
 
 
-@app.before_request
-def create_tables_once():
-    global _db_initialized
-    if not _db_initialized:
-        with app.app_context():
-            db.create_all()
-            app.logger.info("✅ Database and tables created (if not exist).")
-            _db_initialized = True
+# ======================================
+# 🧩 DB INIT
+# ======================================
+# Once at startup: SQLite PRAGMAs on every new pooled connection, and the schema
+init_db(app, db, logger=app.logger)
 
 
 # ======================================
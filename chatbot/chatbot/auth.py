@@ -0,0 +1,122 @@
+# chatbot/auth.py
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# werkzeug's own default, spelled out. Short forms ("scrypt", "pbkdf2") are
+# accepted too; werkzeug fills in its default parameters, and PasswordHasher
+# compares hashes against that expanded form.
+DEFAULT_HASH_METHOD = "scrypt:32768:8:1"
+
+
+class HasherBusyError(RuntimeError):
+    """Raised when too many password hashes are already waiting."""
+
+
+def hash_method(password_hash):
+    """The method part of a werkzeug hash ("scrypt:32768:8:1$salt$hash")."""
+    return password_hash.split("$", 1)[0]
+
+
+class PasswordHasher:
+    """
+    Runs password hashing and verification on a small, bounded thread pool.
+
+    At most `max_workers` KDF computations run at once, so a burst of logins
+    uses a fixed share of the CPU instead of every request worker; beyond
+    `max_pending` waiting calls, new ones fail fast with HasherBusyError.
+    """
+
+    def __init__(self, method=DEFAULT_HASH_METHOD, max_workers=2, max_pending=32):
+        # Stored hashes carry the expanded method ("scrypt" → "scrypt:32768:8:1"),
+        # so hash once to learn it; otherwise needs_rehash would always be True.
+        self.method = hash_method(generate_password_hash("", method))
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="kdf")
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.rejected = 0
+        self.total_ms = 0.0
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HasherBusyError("Too many sign-ins right now, please try again in a moment.")
+        start = time.perf_counter()
+        try:
+            return self._executor.submit(fn, *args).result()
+        finally:
+            self._slots.release()
+            with self._lock:
+                self.completed += 1
+                self.total_ms += (time.perf_counter() - start) * 1000
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """True when a hash was made with other KDF parameters than configured."""
+        return hash_method(password_hash) != self.method
+
+    def stats(self):
+        with self._lock:
+            return {
+                "method": self.method.split(":", 1)[0],
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_ms": round(self.total_ms / self.completed, 2) if self.completed else 0.0,
+            }
+
+
+class UserCache:
+    """
+    TTL cache of loaded users for Flask-Login's user_loader, so an
+    authenticated request does not query the users table every time.
+    `loader(user_id)` returns a user detached from its DB session, or None.
+    """
+
+    def __init__(self, loader, ttl=300, max_entries=10000):
+        self.loader = loader
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # user id → (user, loaded_at)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and now - entry[1] < self.ttl:
+                self.hits += 1
+                self._entries.move_to_end(user_id)
+                return entry[0]
+            self.misses += 1
+
+        user = self.loader(user_id)
+        if user is not None:
+            self.put(user_id, user)
+        return user
+
+    def put(self, user_id, user):
+        with self._lock:
+            self._entries[user_id] = (user, time.monotonic())
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,108 @@
+# chatbot/bench_chat.py
+"""
+End-to-end /chat throughput benchmark, with no network.
+
+    python bench_chat.py --pdf ../test/sample.pdf --requests 200 --concurrency 8
+
+Runs the real Flask app in-process (auth, retrieval, prompt building,
+history writes) on temporary storage, with the stub LLM backend, so numbers reflect our own
+request path plus the stub's configured latency (LLM_STUB_LATENCY_MS).
+The answer cache is disabled unless --answer-cache is given.
+"""
+import argparse
+import os
+import statistics
+import threading
+import time
+import uuid
+
+from bench_storage import use_temp_storage
+
+QUESTIONS = [
+    "What is this document about?",
+    "Summarize the main conclusions.",
+    "Which methods are described?",
+    "List the key definitions.",
+    "What limitations are mentioned?",
+    "Who is the intended audience?",
+    "What results are reported?",
+    "Explain the first section in simple terms.",
+]
+
+
+def login(app, username, password):
+    client = app.test_client()
+    client.post("/register", data={"username": username, "password": password})
+    response = client.post("/login", data={"username": username, "password": password})
+    if response.status_code != 302 or response.headers["Location"].endswith("/login"):
+        raise SystemExit(f"Login failed for {username}")
+    return client
+
+
+def upload(client, pdf):
+    with open(pdf, "rb") as f:
+        response = client.post("/upload", data={"file": (f, os.path.basename(pdf))},
+                               content_type="multipart/form-data")
+    job = response.get_json()
+    if response.status_code not in (200, 202):
+        raise SystemExit(f"Upload failed: {job}")
+    while job.get("status") not in ("done", "error"):
+        time.sleep(0.5)
+        job = client.get(f"/upload/status/{job['job_id']}").get_json()
+    if job["status"] == "error":
+        raise SystemExit(f"Indexing failed: {job.get('error')}")
+    return os.path.basename(pdf)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", required=True, help="PDF to upload and ask questions about")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--answer-cache", action="store_true", help="keep the answer cache enabled")
+    args = parser.parse_args()
+
+    os.environ["LLM_BACKEND"] = "stub"
+    if not args.answer_cache:
+        os.environ["ANSWER_CACHE_SIZE"] = "0"
+    use_temp_storage()
+    from app import app
+
+    username, password = f"bench-{uuid.uuid4().hex[:8]}", "bench-password"
+    filename = upload(login(app, username, password), args.pdf)
+
+    latencies, errors = [], []
+    lock = threading.Lock()
+    counter = iter(range(args.requests))
+
+    def worker():
+        client = login(app, username, password)
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            start = time.perf_counter()
+            response = client.post("/chat", json={"filename": filename, "question": QUESTIONS[i % len(QUESTIONS)]})
+            elapsed = time.perf_counter() - start
+            with lock:
+                (latencies if response.status_code == 200 else errors).append(elapsed)
+
+    threads = [threading.Thread(target=worker) for _ in range(args.concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    print(f"requests    {len(latencies)} ok, {len(errors)} failed in {wall:.2f}s")
+    print(f"throughput  {len(latencies) / wall:.1f} req/s at concurrency {args.concurrency}")
+    if latencies:
+        p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+        print(f"latency     p50 {statistics.median(latencies) * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# chatbot/bench_db.py
+"""
+Per-request cost of the old before_request SQLite setup on the read
+endpoints /user_files and /history/<filename>.
+
+    python bench_db.py --requests 2000 --messages 500
+
+Runs the Flask app in-process against a temporary database. It seeds
+one benchmark user's history, then times both endpoints twice: as the app
+now runs (PRAGMAs set once per pooled connection), and with the old hook
+that ran two PRAGMA statements through the session on every request.
+"""
+import argparse
+import statistics
+import time
+import uuid
+
+from sqlalchemy import text
+
+from bench_storage import use_temp_storage
+
+
+def timed(client, path, n):
+    latencies = []
+    for _ in range(n):
+        start = time.perf_counter()
+        response = client.get(path)
+        latencies.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            raise SystemExit(f"GET {path} failed: {response.status_code}")
+    return statistics.mean(latencies) * 1000, statistics.median(latencies) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--messages", type=int, default=500, help="history rows to seed for the benchmark file")
+    args = parser.parse_args()
+
+    use_temp_storage()
+    from app import app, db, ChatMessage, User
+
+    username, password, filename = f"bench-{uuid.uuid4().hex[:8]}", "bench-password", "bench.pdf"
+    client = app.test_client()
+    client.post("/register", data={"username": username, "password": password})
+    client.post("/login", data={"username": username, "password": password})
+    with app.app_context():
+        user = User.query.filter_by(username=username).first()
+        db.session.add_all(
+            ChatMessage(user_id=user.id, filename=filename, role=("user", "assistant")[i % 2], message=f"message {i}")
+            for i in range(args.messages)
+        )
+        db.session.commit()
+
+    def legacy_pragmas():
+        db.session.execute(text("PRAGMA journal_mode=WAL;"))
+        db.session.execute(text("PRAGMA synchronous = NORMAL;"))
+
+    paths = ["/user_files", f"/history/{filename}"]
+    for path in paths:
+        timed(client, path, min(50, args.requests))  # warm up pool and caches
+
+    print(f"{'endpoint':<22} {'setup':<18} {'mean ms':>8} {'p50 ms':>8}")
+    for path in paths:
+        now_mean, now_p50 = timed(client, path, args.requests)
+        # Re-create the removed hook (bypassing Flask's setup-finished check)
+        app.before_request_funcs.setdefault(None, []).append(legacy_pragmas)
+        try:
+            old_mean, old_p50 = timed(client, path, args.requests)
+        finally:
+            app.before_request_funcs[None].remove(legacy_pragmas)
+        print(f"{path:<22} {'per request':<18} {old_mean:>8.3f} {old_p50:>8.3f}")
+        print(f"{path:<22} {'per connection':<18} {now_mean:>8.3f} {now_p50:>8.3f}")
+        print(f"{'':<22} {'saving':<18} {old_mean - now_mean:>8.3f} {old_p50 - now_p50:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
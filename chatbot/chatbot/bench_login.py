@@ -0,0 +1,113 @@
+# chatbot/bench_login.py
+"""
+Login-storm benchmark: login throughput, and how much a burst of logins
+slows other authenticated requests.
+
+    python bench_login.py --logins 200 --concurrency 16
+    PASSWORD_HASH_METHOD=pbkdf2:sha256:600000 python bench_login.py
+
+Runs the Flask app in-process, on a temporary database. While the logins run, one client keeps
+requesting /user_files, the way /chat traffic would. Compare its latency
+against the idle baseline printed first, and try different
+PASSWORD_HASH_WORKERS / PASSWORD_HASH_METHOD settings.
+"""
+import argparse
+import statistics
+import threading
+import time
+import uuid
+
+from bench_storage import use_temp_storage
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    if not samples:
+        return "n/a"
+    p95 = samples[min(len(samples) - 1, int(0.95 * len(samples)))]
+    return f"p50 {statistics.median(samples) * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms"
+
+
+def log_in(client, username, password):
+    """True when the login redirected to the chat page."""
+    response = client.post("/login", data={"username": username, "password": password})
+    return response.status_code == 302 and not response.headers["Location"].endswith("/login")
+
+
+def probe(client, seconds):
+    """Latencies of back-to-back /user_files requests for `seconds`."""
+    latencies = []
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        start = time.perf_counter()
+        client.get("/user_files")
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--baseline-seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    use_temp_storage()
+    from app import app
+
+    username, password = f"bench-{uuid.uuid4().hex[:8]}", "bench-password"
+    prober = app.test_client()
+    prober.post("/register", data={"username": username, "password": password})
+    if not log_in(prober, username, password):
+        raise SystemExit("Could not register/log in the benchmark user")
+
+    print(f"KDF         {app.config['PASSWORD_HASH_METHOD']} on {app.config['PASSWORD_HASH_WORKERS']} workers")
+    print(f"idle        /user_files {percentiles(probe(prober, args.baseline_seconds))}")
+
+    latencies, failures = [], 0
+    lock = threading.Lock()
+    counter = iter(range(args.logins))
+    done = threading.Event()
+
+    def worker():
+        nonlocal failures
+        client = app.test_client()
+        while True:
+            with lock:
+                if next(counter, None) is None:
+                    return
+            start = time.perf_counter()
+            ok = log_in(client, username, password)
+            elapsed = time.perf_counter() - start
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    failures += 1
+
+    probe_latencies = []
+
+    def probe_until_done():
+        while not done.is_set():
+            probe_latencies.extend(probe(prober, 0.1))
+
+    threads = [threading.Thread(target=worker) for _ in range(args.concurrency)]
+    prober_thread = threading.Thread(target=probe_until_done)
+    start = time.perf_counter()
+    prober_thread.start()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+    done.set()
+    prober_thread.join()
+
+    print(f"logins      {len(latencies)} ok, {failures} rejected/failed in {wall:.2f}s "
+          f"({len(latencies) / wall:.1f}/s at concurrency {args.concurrency})")
+    print(f"login       {percentiles(latencies)}")
+    print(f"under storm /user_files {percentiles(probe_latencies)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+# chatbot/bench_storage.py
+import atexit
+import os
+import shutil
+import tempfile
+
+
+def use_temp_storage():
+    """
+    Points the app's database, upload, index and embedding-cache locations
+    at a fresh temporary directory, removed again at exit, so benchmarks
+    never write to the live chatbot.db or data folders.
+    Call it before importing `app`; returns the directory.
+    """
+    root = tempfile.mkdtemp(prefix="chatbot-bench-")
+    atexit.register(shutil.rmtree, root, ignore_errors=True)
+    os.environ.update({
+        "SQLALCHEMY_DATABASE_URI": "sqlite:///" + os.path.join(root, "chatbot.db"),
+        "UPLOAD_FOLDER": os.path.join(root, "uploads"),
+        "INDEX_FOLDER": os.path.join(root, "indexes"),
+        "EMBEDDING_CACHE_DIR": os.path.join(root, "embedding_cache"),
+    })
+    return root
@@ -0,0 +1,78 @@
+# chatbot/bench_vector_store.py
+"""
+Recall-vs-latency benchmark of the VectorStore backends against exact search.
+
+    python bench_vector_store.py --vectors 100000 --queries 500 --top-k 10
+
+Vectors are synthetic and clustered (a rough stand-in for sentence
+embeddings), so absolute recall is only indicative; use it to compare
+backends and to pick nprobe / efSearch values.
+"""
+import argparse
+import time
+
+import faiss
+import numpy as np
+
+from vector_store import build_faiss_index, set_search_params
+
+
+def make_vectors(n, dim, clusters, rng):
+    centers = rng.standard_normal((clusters, dim)).astype("float32")
+    labels = rng.integers(0, clusters, size=n)
+    return centers[labels] + 0.3 * rng.standard_normal((n, dim)).astype("float32")
+
+
+def timed_search(index, queries, top_k):
+    start = time.perf_counter()
+    _, ids = index.search(queries, top_k)
+    return ids, (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def recall(ids, truth):
+    hits = sum(len(set(row) & set(true_row)) for row, true_row in zip(ids, truth))
+    return hits / truth.size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--metric", choices=("l2", "ip"), default="ip")
+    parser.add_argument("--threads", type=int, default=0, help="FAISS OpenMP threads (0 = library default)")
+    args = parser.parse_args()
+
+    if args.threads:
+        faiss.omp_set_num_threads(args.threads)
+    rng = np.random.default_rng(0)
+    data = make_vectors(args.vectors, args.dim, args.clusters, rng)
+    queries = make_vectors(args.queries, args.dim, args.clusters, rng)
+    if args.metric == "ip":
+        faiss.normalize_L2(data)
+        faiss.normalize_L2(queries)
+
+    flat = build_faiss_index(data, "flat", metric=args.metric)
+    truth, flat_ms = timed_search(flat, queries, args.top_k)
+    print(f"{'backend':<10} {'knob':<14} {'build s':>8} {'recall@k':>9} {'ms/query':>9}")
+    print(f"{'flat':<10} {'-':<14} {0:>8.2f} {1.0:>9.3f} {flat_ms:>9.3f}")
+
+    sweeps = {
+        "hnsw": [("ef_search", v) for v in (16, 32, 64, 128, 256)],
+        "ivf_flat": [("nprobe", v) for v in (1, 4, 16, 64)],
+        "ivf_pq": [("nprobe", v) for v in (1, 4, 16, 64)],
+    }
+    for index_type, knobs in sweeps.items():
+        start = time.perf_counter()
+        index = build_faiss_index(data, index_type, metric=args.metric)
+        build_s = time.perf_counter() - start
+        for name, value in knobs:
+            set_search_params(index, **{name: value})
+            ids, ms = timed_search(index, queries, args.top_k)
+            print(f"{index_type:<10} {f'{name}={value}':<14} {build_s:>8.2f} {recall(ids, truth):>9.3f} {ms:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
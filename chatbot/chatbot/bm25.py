@@ -0,0 +1,191 @@
+# chatbot/bm25.py
+import json
+import math
+import os
+import re
+from array import array
+from collections import Counter
+
+import numpy as np
+
+BM25_META_FILE = "bm25.json"
+BM25_ARRAYS_FILE = "bm25.npz"
+
+# Identifier-friendly tokens: keeps "ERR-404", "v2.1.3", "PN_7731/B" whole.
+_TOKEN = re.compile(r"[^\W_]+(?:[-_./][^\W_]+)*")
+_PART = re.compile(r"[^\W_]+")
+
+# Bumped whenever `tokenize` changes; indexes saved with another version are rebuilt.
+TOKENIZER_VERSION = 2
+
+
+def tokenize(text: str):
+    """
+    Lower-cased word / identifier tokens. Identifiers are followed by their
+    parts ("err-404" → "err-404", "err", "404"), so "404" finds "ERR-404".
+    """
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(_PART.findall(token))
+    return tokens
+
+
+class BM25Index:
+    """
+    In-process sparse inverted index scored with Okapi BM25.
+
+    Postings are collected in compact arrays while chunks are added, then
+    frozen into flat numpy arrays (term → slice of doc ids / term counts),
+    so a query costs one vectorized update per query term.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._building = {}          # term → (array of doc ids, array of term counts)
+        self._doc_lens = array("i")
+        self._frozen = None
+        self.tokenizer_version = TOKENIZER_VERSION
+
+    def __len__(self):
+        if self._frozen is not None:
+            return len(self._frozen["doc_lens"])
+        return len(self._doc_lens)
+
+    def add(self, texts):
+        """Indexes texts as documents numbered after those already present."""
+        texts = list(texts)
+        if not texts:
+            return
+        self._thaw()
+        for text in texts:
+            doc_id = len(self._doc_lens)
+            counts = Counter(tokenize(text))
+            self._doc_lens.append(sum(counts.values()))
+            for term, tf in counts.items():
+                postings = self._building.get(term)
+                if postings is None:
+                    postings = self._building[term] = (array("i"), array("i"))
+                postings[0].append(doc_id)
+                postings[1].append(tf)
+
+    def _freeze(self):
+        """
+        Packs the postings into flat arrays for searching and saving, and
+        drops the appendable form so only one copy is held.
+        """
+        if self._frozen is not None:
+            return self._frozen
+        terms = sorted(self._building)
+        offsets = np.zeros(len(terms) + 1, dtype="int64")
+        for i, term in enumerate(terms):
+            offsets[i + 1] = offsets[i] + len(self._building[term][0])
+        doc_ids = np.empty(offsets[-1], dtype="int32")
+        tfs = np.empty(offsets[-1], dtype="int32")
+        for i, term in enumerate(terms):
+            ids, counts = self._building[term]
+            doc_ids[offsets[i]:offsets[i + 1]] = ids
+            tfs[offsets[i]:offsets[i + 1]] = counts
+        self._frozen = {
+            "vocab": {term: i for i, term in enumerate(terms)},
+            "offsets": offsets,
+            "doc_ids": doc_ids,
+            "tfs": tfs,
+            "doc_lens": np.asarray(self._doc_lens, dtype="int32"),
+        }
+        self._building = {}
+        self._doc_lens = array("i")
+        return self._frozen
+
+    def _thaw(self):
+        """Turns a frozen (e.g. loaded) index back into appendable postings."""
+        frozen = self._frozen
+        if frozen is None:
+            return
+        for term, i in frozen["vocab"].items():
+            start, end = frozen["offsets"][i], frozen["offsets"][i + 1]
+            self._building[term] = (
+                array("i", frozen["doc_ids"][start:end].tolist()),
+                array("i", frozen["tfs"][start:end].tolist()),
+            )
+        self._doc_lens = array("i", frozen["doc_lens"].tolist())
+        self._frozen = None
+
+    def search(self, query: str, top_k: int = 10, max_df: float = None):
+        """
+        Returns up to top_k (doc_id, score) pairs, best first. With `max_df`,
+        only documents matching a rare query term (one found in at most that
+        fraction of the documents, or in a single one) are returned.
+        """
+        frozen = self._freeze()
+        n_docs = len(frozen["doc_lens"])
+        if not n_docs:
+            return []
+        rare_df = max(1, int(max_df * n_docs)) if max_df is not None else None
+        rare_match = np.zeros(n_docs, dtype=bool)
+
+        doc_lens = frozen["doc_lens"]
+        avgdl = max(float(doc_lens.mean()), 1.0)
+        scores = np.zeros(n_docs, dtype="float32")
+        for term in set(tokenize(query)):
+            i = frozen["vocab"].get(term)
+            if i is None:
+                continue
+            start, end = frozen["offsets"][i], frozen["offsets"][i + 1]
+            ids, tf = frozen["doc_ids"][start:end], frozen["tfs"][start:end]
+            df = end - start
+            idf = math.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1.0 - self.b + self.b * doc_lens[ids] / avgdl)
+            scores[ids] += idf * tf * (self.k1 + 1.0) / (tf + norm)
+            if rare_df is not None and df <= rare_df:
+                rare_match[ids] = True
+
+        if rare_df is not None:
+            scores *= rare_match
+        hits = np.flatnonzero(scores)
+        if not len(hits):
+            return []
+        if len(hits) > top_k:
+            hits = hits[np.argpartition(-scores[hits], top_k - 1)[:top_k]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        return [(int(i), float(scores[i])) for i in hits]
+
+    def nbytes(self):
+        frozen = self._freeze()
+        return sum(frozen[k].nbytes for k in ("offsets", "doc_ids", "tfs", "doc_lens")) + 64 * len(frozen["vocab"])
+
+    def save(self, directory: str):
+        frozen = self._freeze()
+        np.savez(
+            os.path.join(directory, BM25_ARRAYS_FILE),
+            offsets=frozen["offsets"], doc_ids=frozen["doc_ids"],
+            tfs=frozen["tfs"], doc_lens=frozen["doc_lens"],
+        )
+        terms = sorted(frozen["vocab"], key=frozen["vocab"].get)
+        with open(os.path.join(directory, BM25_META_FILE), "w", encoding="utf-8") as f:
+            json.dump(
+                {"k1": self.k1, "b": self.b, "tokenizer": self.tokenizer_version, "terms": terms},
+                f, ensure_ascii=False,
+            )
+
+    @staticmethod
+    def exists(directory: str) -> bool:
+        return os.path.exists(os.path.join(directory, BM25_META_FILE))
+
+    @classmethod
+    def load(cls, directory: str) -> "BM25Index":
+        with open(os.path.join(directory, BM25_META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        arrays = np.load(os.path.join(directory, BM25_ARRAYS_FILE))
+        index = cls(k1=meta["k1"], b=meta["b"])
+        index.tokenizer_version = meta.get("tokenizer", 1)
+        index._frozen = {
+            "vocab": {term: i for i, term in enumerate(meta["terms"])},
+            "offsets": arrays["offsets"],
+            "doc_ids": arrays["doc_ids"],
+            "tfs": arrays["tfs"],
+            "doc_lens": arrays["doc_lens"],
+        }
+        return index
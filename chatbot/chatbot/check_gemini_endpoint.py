@@ -0,0 +1,108 @@
+# chatbot/check_gemini_endpoint.py
+"""
+Runs the Gemini client against a local fake server through
+GEMINI_API_ENDPOINT, without network access or a real API key.
+
+    python check_gemini_endpoint.py
+
+Checks generate and stream, that a stream holds its concurrency slot until
+it is closed, and that a slow stream is cut off at its deadline.
+"""
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PIECES = ["Binary search ", "halves the range ", "on every step."]
+SLOW_DELAY = 0.5  # seconds between streamed pieces for prompts containing "slow"
+
+
+def candidate(text):
+    return {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP"}]}
+
+
+class FakeGemini(BaseHTTPRequestHandler):
+    """Answers generateContent and streamGenerateContent like the REST API."""
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        prompt = json.dumps(body)
+        delay = SLOW_DELAY if "slow" in prompt else 0.0
+
+        if ":streamGenerateContent" in self.path:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            sse = "alt=sse" in self.path
+            self.wfile.write(b"" if sse else b"[")
+            for i, piece in enumerate(PIECES):
+                time.sleep(delay)
+                data = json.dumps(candidate(piece))
+                if sse:
+                    self.wfile.write(f"data: {data}\r\n\r\n".encode())
+                else:
+                    self.wfile.write(((", " if i else "") + data).encode())
+                self.wfile.flush()
+            self.wfile.write(b"" if sse else b"]")
+        elif ":generateContent" in self.path:
+            data = json.dumps(candidate("".join(PIECES))).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        else:
+            self.send_error(404)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeGemini)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    endpoint = f"http://127.0.0.1:{server.server_address[1]}"
+
+    os.environ.update({
+        "GEMINI_API_KEY": "fake-key",
+        "GEMINI_API_ENDPOINT": endpoint,
+        "GEMINI_MODELS": "models/fake-model",
+        "GEMINI_MAX_RETRIES": "0",
+    })
+    from gemini_client import generate_answer, stream_answer
+    from llm_client import GeminiClient, LLMBusyError, LLMTimeoutError
+
+    expected = "".join(PIECES)
+    assert generate_answer("Explain binary search.") == expected.strip()
+    assert "".join(stream_answer("Explain binary search.")) == expected
+    print(f"✅ generate and stream via {endpoint}")
+
+    single = GeminiClient("fake-key", models=["models/fake-model"], max_retries=0,
+                          max_concurrency=1, api_endpoint=endpoint)
+    stream = single.stream("Explain binary search.")
+    next(stream)
+    try:
+        single.generate("Another question", timeout=0.5)
+        raise AssertionError("generate got a slot while a stream was open")
+    except LLMBusyError:
+        pass
+    stream.close()
+    assert single.generate("Another question", timeout=5) == expected.strip()
+    print("✅ an open stream holds its slot until closed")
+
+    start = time.monotonic()
+    try:
+        "".join(single.stream("slow please", timeout=SLOW_DELAY * 1.5))
+        raise AssertionError("slow stream finished past its deadline")
+    except LLMTimeoutError:
+        pass
+    assert time.monotonic() - start < SLOW_DELAY * len(PIECES)
+    assert single.generate("Another question", timeout=5) == expected.strip()
+    print("✅ slow stream stopped at its deadline and released its slot")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
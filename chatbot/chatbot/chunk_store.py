@@ -0,0 +1,99 @@
+# chatbot/chunk_store.py
+import mmap
+import os
+from array import array
+
+import numpy as np
+
+BLOB_FILE = "chunks.bin"
+OFFSETS_FILE = "chunk_offsets.npy"
+
+
+class ChunkStore:
+    """
+    Compact, append-only sequence of chunk texts.
+
+    All chunks live in one UTF-8 buffer with an int64 offsets array, instead
+    of one Python str per chunk. A saved store is reopened memory-mapped, so
+    its text stays in the OS page cache and only the chunks actually read
+    (e.g. the top-k search hits) are decoded.
+    """
+
+    def __init__(self, texts=()):
+        self._buffer = bytearray()
+        self._offsets = array("q", [0])
+        self._mmap = None
+        self._mapped = False
+        self.extend(texts)
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("chunk index out of range")
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        return bytes(self._buffer[start:end]).decode("utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def _make_writable(self):
+        """Copies a memory-mapped store into memory before it is appended to."""
+        if not self._mapped:
+            return
+        view = self._buffer
+        self._buffer = bytearray(view)
+        self._offsets = array("q", (int(o) for o in self._offsets))
+        if self._mmap is not None:
+            view.release()
+            self._mmap.close()
+            self._mmap = None
+        self._mapped = False
+
+    def append(self, text):
+        self.extend([text])
+
+    def extend(self, texts):
+        self._make_writable()
+        for text in texts:
+            self._buffer += text.encode("utf-8")
+            self._offsets.append(len(self._buffer))
+
+    def nbytes(self):
+        """Heap bytes held; a memory-mapped buffer lives in the page cache instead."""
+        offsets = len(self._offsets) * 8
+        return offsets if self._mapped else offsets + len(self._buffer)
+
+    def save(self, directory):
+        # Write beside and rename, so a store mapped from these files stays valid.
+        blob_path = os.path.join(directory, BLOB_FILE)
+        with open(blob_path + ".tmp", "wb") as f:
+            f.write(self._buffer)
+        os.replace(blob_path + ".tmp", blob_path)
+
+        offsets_path = os.path.join(directory, OFFSETS_FILE)
+        with open(offsets_path + ".tmp", "wb") as f:
+            np.save(f, np.asarray(self._offsets, dtype="int64"))
+        os.replace(offsets_path + ".tmp", offsets_path)
+
+    @staticmethod
+    def exists(directory):
+        return os.path.exists(os.path.join(directory, OFFSETS_FILE))
+
+    @classmethod
+    def load(cls, directory):
+        """Opens a saved store with the text and offsets memory-mapped."""
+        store = cls()
+        store._mapped = True
+        store._offsets = np.load(os.path.join(directory, OFFSETS_FILE), mmap_mode="r")
+        with open(os.path.join(directory, BLOB_FILE), "rb") as f:
+            if os.fstat(f.fileno()).st_size:
+                store._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                store._buffer = memoryview(store._mmap)
+        return store
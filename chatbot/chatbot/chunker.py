@@ -0,0 +1,95 @@
+# chatbot/chunker.py
+import os
+import re
+from bisect import bisect_left
+
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "200"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "40"))
+
+# Sentence ends: terminal punctuation followed by whitespace, or a blank line.
+_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n\s*\n")
+
+
+def sentence_spans(text):
+    """Yields (start, end) character spans of the sentences in `text`."""
+    start = 0
+    for m in _BOUNDARY.finditer(text):
+        if text[start:m.start()].strip():
+            yield start, m.start()
+        start = m.end()
+    if text[start:].strip():
+        yield start, len(text)
+
+
+class TokenChunker:
+    """
+    Sliding-window chunker measured in tokenizer tokens.
+
+    Chunks are packed from whole sentences up to `max_tokens`, and each new
+    chunk repeats up to `overlap_tokens` worth of trailing sentences from the
+    previous one. A sentence longer than `max_tokens` is cut on token
+    boundaries into windows that also overlap by `overlap_tokens`. Chunks never cross a page, and each carries its page number
+    and character offsets into that page's text.
+    """
+
+    def __init__(self, tokenizer, max_tokens=CHUNK_MAX_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS):
+        if overlap_tokens >= max_tokens:
+            raise ValueError("overlap_tokens must be smaller than max_tokens")
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+
+    def _units(self, text):
+        """Splits a page into (start, end, n_tokens) units no longer than max_tokens."""
+        offsets = self.tokenizer(
+            text, add_special_tokens=False, return_offsets_mapping=True, verbose=False
+        )["offset_mapping"]
+        token_starts = [s for s, _ in offsets]
+
+        units = []
+        for start, end in sentence_spans(text):
+            first, last = bisect_left(token_starts, start), bisect_left(token_starts, end)
+            if last - first <= self.max_tokens:
+                units.append((start, end, max(1, last - first)))
+                continue
+            # Consecutive windows share `overlap_tokens` tokens, like sentence-packed chunks.
+            i = first
+            while True:
+                j = min(i + self.max_tokens, last)
+                units.append((offsets[i][0], offsets[j - 1][1], j - i))
+                if j >= last:
+                    break
+                i += self.max_tokens - self.overlap_tokens
+        return units
+
+    def chunk_page(self, page_number, text):
+        """Yields (chunk, {"page", "start", "end"}) for one page."""
+        units = self._units(text)
+        i = 0
+        while i < len(units):
+            j, total = i, 0
+            while j < len(units) and (j == i or total + units[j][2] <= self.max_tokens):
+                total += units[j][2]
+                j += 1
+
+            start, end = units[i][0], units[j - 1][1]
+            chunk = text[start:end].replace("\n", " ").strip()
+            if chunk:
+                yield chunk, {"page": page_number, "start": start, "end": end}
+            if j >= len(units):
+                break
+
+            # Step back over trailing sentences that fit in the overlap budget,
+            # but always advance by at least one unit. Skip the overlap when the
+            # next unit would not fit beside it: that chunk would hold only the
+            # overlap, i.e. repeat text already in this one.
+            k, overlap = j, 0
+            while k - 1 > i and overlap + units[k - 1][2] <= self.overlap_tokens:
+                k -= 1
+                overlap += units[k][2]
+            i = k if overlap + units[j][2] <= self.max_tokens else j
+
+    def chunk_pages(self, pages):
+        """Chunks a stream of (page_number, text) pages lazily."""
+        for page_number, text in pages:
+            yield from self.chunk_page(page_number, text)
@@ -0,0 +1,119 @@
+# chatbot/context_budget.py
+import os
+import re
+
+from chunker import sentence_spans
+
+PROMPT_CONTEXT_TOKENS = int(os.getenv("PROMPT_CONTEXT_TOKENS", "1200"))
+PROMPT_CHUNK_MAX_TOKENS = int(os.getenv("PROMPT_CHUNK_MAX_TOKENS", "400"))
+PROMPT_DEDUP_THRESHOLD = float(os.getenv("PROMPT_DEDUP_THRESHOLD", "0.8"))
+
+_WORD = re.compile(r"\w+")
+
+
+def _shingles(text, n=5):
+    """Word n-grams of `text`, for near-duplicate detection."""
+    words = _WORD.findall(text.lower())
+    if len(words) < n:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + n]) for i in range(len(words) - n + 1)}
+
+
+class ContextBudgeter:
+    """
+    Packs retrieved chunks into the prompt under a token budget.
+
+    Chunks are taken in ranking order. A chunk that overlaps one already
+    packed (same document and page) keeps only its new text, one whose
+    word 5-grams are mostly already present is skipped, and no chunk may
+    exceed `max_chunk_tokens`. When the next chunk does not fit, it is
+    trimmed (at a sentence end if possible) to the tokens left, provided at
+    least `min_fragment_tokens` remain. Each chunk also costs
+    `chunk_overhead` tokens for its page label and separator.
+    """
+
+    def __init__(self, tokenizer, budget=PROMPT_CONTEXT_TOKENS, max_chunk_tokens=PROMPT_CHUNK_MAX_TOKENS,
+                 dedup_threshold=PROMPT_DEDUP_THRESHOLD, chunk_overhead=8, min_fragment_tokens=32):
+        self.tokenizer = tokenizer
+        self.budget = budget
+        self.max_chunk_tokens = max_chunk_tokens
+        self.dedup_threshold = dedup_threshold
+        self.chunk_overhead = chunk_overhead
+        self.min_fragment_tokens = min_fragment_tokens
+
+    def _offsets(self, text):
+        return self.tokenizer(
+            text, add_special_tokens=False, return_offsets_mapping=True, verbose=False
+        )["offset_mapping"]
+
+    def count(self, text):
+        """Number of tokens in `text`."""
+        return len(self._offsets(text))
+
+    def trim(self, text, max_tokens, offsets=None):
+        """
+        Cuts `text` to at most `max_tokens` tokens, at the last sentence end
+        that fits when one is reasonably close. Returns (text, n_tokens).
+        """
+        offsets = self._offsets(text) if offsets is None else offsets
+        if len(offsets) <= max_tokens:
+            return text, len(offsets)
+        if max_tokens <= 0:
+            return "", 0
+        limit = offsets[max_tokens - 1][1]
+        cut = max((end for _, end in sentence_spans(text) if end <= limit), default=0)
+        if cut < limit // 2:
+            # No sentence end near enough: cut on a token boundary instead
+            cut = limit
+        return text[:cut].rstrip(), sum(1 for _, end in offsets if end <= cut)
+
+    @staticmethod
+    def _new_text(result, packed_spans):
+        """The part of a chunk not covered by already packed chunks of the same page."""
+        text, start, end = result["chunk"], result.get("start"), result.get("end")
+        if start is None or end is None or end - start != len(text):
+            return text
+        cut = False
+        for s, e in packed_spans:
+            if s <= start and end <= e:
+                return ""
+            if s <= start < e:
+                text, start, cut = text[e - start:], e, True
+            elif s < end <= e:
+                text, end, cut = text[:s - start], s, True
+        return text.strip() if cut else text
+
+    def pack(self, results):
+        """
+        Returns (packed results, context tokens). Packed results are copies
+        whose "chunk" holds the text actually sent; each gets a "tokens" count.
+        """
+        packed, used = [], 0
+        seen = set()
+        spans = {}  # (doc, page) → [(start, end), ...] already packed
+        for result in results:
+            left = self.budget - used - self.chunk_overhead
+            if left < min(self.min_fragment_tokens, self.max_chunk_tokens):
+                break
+
+            page_key = (result.get("doc"), result.get("page"))
+            text = self._new_text(result, spans.get(page_key, ()))
+            shingles = _shingles(text)
+            if not shingles or len(shingles & seen) >= self.dedup_threshold * len(shingles):
+                continue
+
+            offsets = self._offsets(text)
+            text, n_tokens = self.trim(text, min(left, self.max_chunk_tokens), offsets)
+            if not text:
+                continue
+
+            seen |= _shingles(text)
+            if text == result["chunk"] and result.get("start") is not None and result.get("end") is not None:
+                # Only whole chunks mark their span as covered
+                spans.setdefault(page_key, []).append((result["start"], result["end"]))
+            packed.append(dict(result, chunk=text, tokens=n_tokens))
+            used += n_tokens + self.chunk_overhead
+            if len(offsets) > left:
+                # Trimmed to fit: the budget is spent
+                break
+        return packed, used
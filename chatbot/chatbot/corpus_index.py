@@ -0,0 +1,270 @@
+# chatbot/corpus_index.py
+import threading
+from contextlib import contextmanager
+
+import faiss
+import numpy as np
+
+from vector_store import DEFAULT_METRIC, empty_index
+
+# Vector ids pack (doc_id, chunk_no) into one int64 so a document's vectors
+# form a contiguous id range that can be selected or removed in one go.
+CHUNK_BITS = 32
+
+
+def _id_range(doc_id):
+    return doc_id << CHUNK_BITS, (doc_id + 1) << CHUNK_BITS
+
+
+def _doc_selector(doc_ids):
+    """
+    FAISS selector for the vectors of `doc_ids`: a balanced tree of
+    IDSelectorOr over their id ranges, so building it costs O(documents)
+    and testing an id O(log documents), however many chunks they hold.
+    Returns (selector, parts); `parts` must outlive the selector.
+    """
+    parts = [faiss.IDSelectorRange(*_id_range(d)) for d in sorted(doc_ids)]
+    level = parts
+    while len(level) > 1:
+        paired = [faiss.IDSelectorOr(a, b) for a, b in zip(level[::2], level[1::2])]
+        if len(level) % 2:
+            paired.append(level[-1])
+        parts.extend(paired)
+        level = paired
+    return level[0], parts
+
+
+class _ReadWriteLock:
+    """
+    Lets any number of searches run together, while adds and removes get
+    the index to themselves. Writers are re-entrant and go before new readers.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = None
+        self._depth = 0
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer != me:
+                while self._writer is not None or self._waiting_writers:
+                    self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._depth += 1
+            else:
+                self._waiting_writers += 1
+                while self._writer is not None or self._readers:
+                    self._cond.wait()
+                self._waiting_writers -= 1
+                self._writer, self._depth = me, 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._depth -= 1
+                if not self._depth:
+                    self._writer = None
+                    self._cond.notify_all()
+
+
+class CorpusIndex:
+    """
+    One FAISS index over the chunks of many documents.
+
+    Each document gets a compact integer doc id; searches can be limited to
+    one document, a set of documents, or everything a user owns. Documents
+    are added and removed in place (IndexIDMap2 over an exact index), so
+    the corpus never needs a rebuild.
+    """
+
+    def __init__(self, embedding_dim: int = None, metric: str = DEFAULT_METRIC):
+        self.metric = metric
+        self.index = None
+        self.embedding_dim = None
+        if embedding_dim is not None:
+            self._init_index(embedding_dim)
+        self._lock = _ReadWriteLock()
+        self._next_doc_id = 0
+        self.doc_ids = {}   # document key (content digest) → doc id
+        self.docs = {}      # doc id → {"key", "chunks", "chunk_meta"}
+        self.owners = {}    # owner → set of doc ids
+
+    def _init_index(self, embedding_dim):
+        self.embedding_dim = embedding_dim
+        self.index = faiss.IndexIDMap2(empty_index(embedding_dim, self.metric))
+
+    def __contains__(self, key):
+        return key in self.doc_ids
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add_document(self, key, chunks, embeddings, chunk_meta=None, owner=None):
+        """
+        Adds a document's chunks under `key` and returns its doc id.
+        Adding a key that is already present only records the extra owner.
+        `embeddings` must use the corpus metric (normalized for "ip").
+        """
+        with self._lock.write():
+            doc_id = self.doc_ids.get(key)
+            if doc_id is None:
+                embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+                if self.index is None:
+                    self._init_index(embeddings.shape[1])
+
+                doc_id = self._next_doc_id
+                self._next_doc_id += 1
+                if len(chunks):
+                    ids = np.arange(len(chunks), dtype="int64") + _id_range(doc_id)[0]
+                    self.index.add_with_ids(embeddings, ids)
+                self.doc_ids[key] = doc_id
+                self.docs[doc_id] = {
+                    "key": key,
+                    "chunks": chunks,
+                    "chunk_meta": chunk_meta if chunk_meta is not None else [{} for _ in chunks],
+                }
+            if owner is not None:
+                self.owners.setdefault(owner, set()).add(doc_id)
+            return doc_id
+
+    def add_store(self, key, store, owner=None):
+        """Adds the vectors and chunks of a VectorStore with the same metric."""
+        if store.metric != self.metric:
+            raise ValueError(f"Store metric {store.metric!r} does not match corpus metric {self.metric!r}")
+        with self._lock.write():
+            if key in self.doc_ids:
+                if owner is not None:
+                    self.add_owner(key, owner)
+                return self.doc_ids[key]
+            return self.add_document(key, store.chunks, store.vectors(), store.chunk_meta, owner=owner)
+
+    def nbytes(self, key) -> int:
+        """
+        Approximate memory held for one document: its float32 vectors plus
+        id-map entries. Chunks and metadata are shared with its VectorStore.
+        """
+        with self._lock.read():
+            doc_id = self.doc_ids.get(key)
+            if doc_id is None or self.index is None:
+                return 0
+            return len(self.docs[doc_id]["chunks"]) * (self.embedding_dim * 4 + 48)
+
+    def add_owner(self, key, owner):
+        with self._lock.write():
+            self.owners.setdefault(owner, set()).add(self.doc_ids[key])
+
+    def remove_document(self, key):
+        """Drops a document's vectors and chunks; returns False if it was unknown."""
+        with self._lock.write():
+            doc_id = self.doc_ids.pop(key, None)
+            if doc_id is None:
+                return False
+            self.index.remove_ids(faiss.IDSelectorRange(*_id_range(doc_id)))
+            del self.docs[doc_id]
+            for doc_set in self.owners.values():
+                doc_set.discard(doc_id)
+            return True
+
+    def _doc_filter(self, keys=None, owner=None):
+        """Resolves the key/owner filters to a set of doc ids, or None for all."""
+        if keys is None and owner is None:
+            return None
+        selected = set(self.doc_ids.values())
+        if isinstance(keys, str):
+            keys = [keys]
+        if keys is not None:
+            selected &= {self.doc_ids[k] for k in keys if k in self.doc_ids}
+        if owner is not None:
+            selected &= self.owners.get(owner, set())
+        return selected
+
+    def search_batch(self, query_embeddings, top_k=3, keys=None, owner=None, min_score=None):
+        """
+        Searches N queries in one FAISS call, limited to the documents in
+        `keys` (one key or several) and/or owned by `owner`.
+        Returns N ranked lists of hits tagged with their document key.
+        """
+        queries = np.array(query_embeddings, dtype="float32", ndmin=2)
+        if self.metric == "ip":
+            faiss.normalize_L2(queries)
+
+        with self._lock.read():
+            doc_set = self._doc_filter(keys, owner)
+        if doc_set == set():
+            return [[] for _ in range(len(queries))]
+        # Built outside the lock; a document removed meanwhile just matches nothing.
+        params = None
+        if doc_set is not None:
+            selector, parts = _doc_selector(doc_set)  # `parts` keeps the sub-selectors alive
+            params = faiss.SearchParameters(sel=selector)
+
+        with self._lock.read():
+            if self.index is None or self.index.ntotal == 0:
+                return [[] for _ in range(len(queries))]
+            distances, ids = self.index.search(queries, min(top_k, self.index.ntotal), params=params)
+
+            batch = []
+            for row_scores, row_ids in zip(distances, ids):
+                results = []
+                for score, vector_id in zip(row_scores, row_ids):
+                    if vector_id < 0:
+                        continue
+                    score = float(score)
+                    if min_score is not None and self.metric == "ip" and score < min_score:
+                        continue
+                    doc = self.docs[int(vector_id) >> CHUNK_BITS]
+                    chunk_no = int(vector_id) & ((1 << CHUNK_BITS) - 1)
+                    result = dict(doc["chunk_meta"][chunk_no])
+                    result.update({
+                        "chunk": doc["chunks"][chunk_no],
+                        "score": score,
+                        "doc": doc["key"],
+                        "id": chunk_no,
+                    })
+                    results.append(result)
+                batch.append(results)
+            return batch
+
+    def view(self, keys=None, owner=None, skipped=0):
+        """A VectorStore-like object searching only the selected documents."""
+        return CorpusView(self, keys=keys, owner=owner, skipped=skipped)
+
+
+class CorpusView:
+    """
+    Filtered window onto a CorpusIndex exposing the VectorStore search API,
+    so `rag.answer_question` can run across several documents unchanged.
+    `skipped` counts selected documents that could not be searched.
+    """
+
+    def __init__(self, corpus, keys=None, owner=None, skipped=0):
+        self.corpus = corpus
+        self.keys = keys
+        self.owner = owner
+        self.skipped = skipped
+
+    def search_batch(self, query_embeddings, top_k=3, min_score=None):
+        return self.corpus.search_batch(
+            query_embeddings, top_k=top_k, keys=self.keys, owner=self.owner, min_score=min_score
+        )
+
+    def search(self, query_embedding, top_k=3, min_score=None):
+        return self.search_batch(query_embedding, top_k=top_k, min_score=min_score)[0]
@@ -0,0 +1,40 @@
+# chatbot/db_setup.py
+from sqlalchemy import event
+
+
+def sqlite_pragmas(config):
+    """PRAGMAs applied to every new SQLite connection, from app config."""
+    return [
+        ("journal_mode", "WAL"),                     # readers don't block the writer
+        ("synchronous", config["SQLITE_SYNCHRONOUS"]),
+        ("busy_timeout", config["SQLITE_BUSY_TIMEOUT_MS"]),
+        ("cache_size", -config["SQLITE_CACHE_SIZE_KB"]),   # negative = KiB, not pages
+        ("mmap_size", config["SQLITE_MMAP_SIZE_MB"] * 1024 * 1024),
+    ]
+
+
+def install_sqlite_pragmas(engine, pragmas):
+    """
+    Runs `pragmas` once per pooled DBAPI connection, when the pool opens it,
+    instead of on every request. No-op for other databases.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas:
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+def init_db(app, db, logger=None):
+    """Connection setup and schema creation, done once at startup."""
+    with app.app_context():
+        install_sqlite_pragmas(db.engine, sqlite_pragmas(app.config))
+        db.create_all()
+    if logger:
+        logger.info("✅ Database and tables created (if not exist).")
@@ -1,32 +1,134 @@
+import os
+
 from sentence_transformers import SentenceTransformer
 import numpy as np
 
+from embedding_cache import EmbeddingCache
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+CACHE_DIR = os.getenv(
+    "EMBEDDING_CACHE_DIR",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "embedding_cache")),
+)
+
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+
 # Load once globally
-model = SentenceTransformer("all-MiniLM-L6-v2")
+model = SentenceTransformer(MODEL_NAME)
+cache = EmbeddingCache(
+    CACHE_DIR,
+    MODEL_NAME,
+    model.get_sentence_embedding_dimension(),
+    max_memory_items=int(os.getenv("EMBEDDING_CACHE_ITEMS", "10000")),
+)
+
+def normalize_rows(vectors):
+    """L2-normalizes each row of a float32 matrix in place and returns it."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    vectors /= norms
+    return vectors
+
 
-def chunk_text(text, max_length=500):
+class EmbeddingEngine:
     """
-    Splits long text into smaller chunks of ~500 characters.
-    Returns a list of text chunks.
+    Batched, length-bucketed encoder around a SentenceTransformer.
+
+    Texts are sorted by token length so each batch pads to a similar size,
+    encoded `batch_size` at a time, and written straight into a preallocated
+    float32 array in the caller's original order.
     """
-    lines = text.split('\n')
-    chunks, current = [], ""
 
-    for line in lines:
-        if len(current) + len(line) < max_length:
-            current += line + " "
-        else:
-            chunks.append(current.strip())
-            current = line + " "
-    if current:
-        chunks.append(current.strip())
-    return chunks
+    def __init__(self, model, batch_size=32, normalize=False):
+        self.model = model
+        self.batch_size = batch_size
+        self.normalize = normalize
+        self.dim = model.get_sentence_embedding_dimension()
+
+    def token_lengths(self, texts):
+        """Token counts (capped at the model's max sequence length) used for bucketing."""
+        max_len = self.model.get_max_seq_length() or 512
+        encoded = self.model.tokenizer(
+            list(texts), add_special_tokens=True, truncation=True, max_length=max_len
+        )["input_ids"]
+        return [len(ids) for ids in encoded]
+
+    def encode(self, texts, progress=None, normalize=None):
+        """
+        Returns a (len(texts), dim) float32 array aligned with `texts`.
+        `progress(done, total)` is called after each batch.
+        """
+        normalize = self.normalize if normalize is None else normalize
+        out = np.empty((len(texts), self.dim), dtype="float32")
+        if not texts:
+            return out
+
+        order = np.argsort(self.token_lengths(texts), kind="stable")
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            out[batch] = self.model.encode(
+                [texts[i] for i in batch],
+                batch_size=len(batch),
+                convert_to_numpy=True,
+                normalize_embeddings=normalize,
+                show_progress_bar=False,
+            )
+            if progress:
+                progress(start + len(batch), len(order))
+        return out
+
 
+engine = EmbeddingEngine(model, batch_size=EMBED_BATCH_SIZE)
 
-def embed_chunks(chunks):
+
+def embed_chunks(chunks, progress=None, normalize=False):
     """
     Creates vector embeddings for each text chunk.
+    Only chunks missing from the embedding cache are sent to the model,
+    through the batched `engine`; `progress(done, total)` is called after
+    each batch. With `normalize`, rows are L2-normalized.
     Returns numpy array of embeddings.
     """
-    embeddings = model.encode(chunks)
-    return np.array(embeddings)
+    embeddings = np.empty((len(chunks), cache.dim), dtype="float32")
+    missing = []
+    for i, vector in enumerate(cache.get_many(chunks)):
+        if vector is None:
+            missing.append(i)
+        else:
+            embeddings[i] = vector
+
+    if missing:
+        # The cache holds raw model output; normalization is applied below.
+        texts = [chunks[i] for i in missing]
+        encoded = engine.encode(texts, progress=progress, normalize=False)
+        embeddings[missing] = encoded
+        cache.put_many(texts, encoded)
+
+    if normalize:
+        normalize_rows(embeddings)
+    return embeddings
+
+
+def embed_query(query, normalize=False):
+    """
+    Embeds a single question; repeated questions are served from the cache.
+    Returns numpy array of shape (1, dim).
+    """
+    return embed_chunks([query], normalize=normalize)
+
+
+def embed_chunk_stream(chunks, batch_size=256, normalize=False):
+    """
+    Embeds a stream of (chunk, meta) pairs, `batch_size` chunks at a time.
+    Yields (texts, metas, embeddings) per batch so callers never hold
+    more than one batch of vectors.
+    """
+    texts, metas = [], []
+    for text, meta in chunks:
+        texts.append(text)
+        metas.append(meta)
+        if len(texts) >= batch_size:
+            yield texts, metas, embed_chunks(texts, normalize=normalize)
+            texts, metas = [], []
+    if texts:
+        yield texts, metas, embed_chunks(texts, normalize=normalize)
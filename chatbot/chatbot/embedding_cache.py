@@ -0,0 +1,162 @@
+# chatbot/embedding_cache.py
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, so each process gets its own directory
+    fcntl = None
+
+VECTORS_FILE = "vectors.f32"
+KEYS_FILE = "keys.txt"
+LOCK_FILE = "append.lock"
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Collapses whitespace so trivially different copies of a chunk share a key."""
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache keyed by model name + normalized text.
+
+    Vectors are appended to a flat float32 file that is read back through a
+    memory map; a bounded in-memory LRU sits in front of it for hot entries
+    (repeated boilerplate, popular questions). Appends take an exclusive
+    file lock, so several worker processes can share one directory; where
+    flock is unavailable, each process uses its own subdirectory.
+    """
+
+    def __init__(self, directory: str, model_name: str, dim: int, max_memory_items: int = 10000):
+        self.directory = os.path.join(directory, re.sub(r"[^\w.-]", "_", model_name))
+        if fcntl is None:
+            self.directory = os.path.join(self.directory, f"pid-{os.getpid()}")
+        self.model_name = model_name
+        self.dim = dim
+        self.max_memory_items = max_memory_items
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._rows = {}
+        self._mmap = None
+        os.makedirs(self.directory, exist_ok=True)
+        self._vectors_path = os.path.join(self.directory, VECTORS_FILE)
+        self._keys_path = os.path.join(self.directory, KEYS_FILE)
+        self._lock_path = os.path.join(self.directory, LOCK_FILE)
+        self._load_keys()
+
+    def key(self, text: str) -> str:
+        payload = f"{self.model_name}\0{normalize_text(text)}".encode("utf-8")
+        return hashlib.sha1(payload).hexdigest()
+
+    def _load_keys(self):
+        """Reads the key log, dropping keys whose vector never reached disk."""
+        row_bytes = self.dim * 4
+        stored_rows = 0
+        if os.path.exists(self._vectors_path):
+            stored_rows = os.path.getsize(self._vectors_path) // row_bytes
+        if os.path.exists(self._keys_path):
+            with open(self._keys_path, encoding="ascii") as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) == 2 and int(parts[1]) < stored_rows:
+                        self._rows[parts[0]] = int(parts[1])
+
+    @contextmanager
+    def _append_lock(self):
+        """Exclusive lock on the on-disk log, across processes."""
+        if fcntl is None:
+            yield
+            return
+        with open(self._lock_path, "a") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _row(self, row: int) -> np.ndarray:
+        if self._mmap is None or row >= self._mmap.shape[0]:
+            rows = os.path.getsize(self._vectors_path) // (self.dim * 4)
+            self._mmap = np.memmap(self._vectors_path, dtype="float32", mode="r", shape=(rows, self.dim))
+        return np.array(self._mmap[row])
+
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def get_many(self, texts):
+        """
+        Returns a list aligned with `texts`: a cached vector, or None on a miss.
+        """
+        results = []
+        with self._lock:
+            for text in texts:
+                key = self.key(text)
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                elif key in self._rows:
+                    vector = self._row(self._rows[key])
+                    self._remember(key, vector)
+
+                if vector is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                results.append(vector)
+        return results
+
+    def put_many(self, texts, vectors):
+        """Stores freshly computed vectors in memory and appends them to disk."""
+        vectors = np.asarray(vectors, dtype="float32").reshape(-1, self.dim)
+        with self._lock:
+            new_keys, new_rows, seen = [], [], set()
+            for text, vector in zip(texts, vectors):
+                key = self.key(text)
+                self._remember(key, vector.copy())
+                if key not in self._rows and key not in seen:
+                    seen.add(key)
+                    new_keys.append(key)
+                    new_rows.append(vector)
+            if not new_keys:
+                return
+
+            # Vectors first, then keys: a key on disk always has its vector.
+            # Writing from the last whole row also discards a torn tail write.
+            # The row number is read under the file lock, so two processes
+            # never claim the same rows.
+            row_bytes = self.dim * 4
+            with self._append_lock():
+                first_row = 0
+                if os.path.exists(self._vectors_path):
+                    first_row = os.path.getsize(self._vectors_path) // row_bytes
+                with open(self._vectors_path, "r+b" if first_row else "wb") as f:
+                    f.seek(first_row * row_bytes)
+                    f.write(np.asarray(new_rows, dtype="float32").tobytes())
+                    f.truncate()
+                with open(self._keys_path, "a", encoding="ascii") as f:
+                    f.write("".join(f"{k} {first_row + i}\n" for i, k in enumerate(new_keys)))
+            for offset, key in enumerate(new_keys):
+                self._rows[key] = first_row + offset
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "memory_items": len(self._memory),
+            "disk_items": len(self._rows),
+        }
@@ -1,7 +1,8 @@
-import google.generativeai as genai
 import os
 from dotenv import load_dotenv
 
+from llm_client import DEFAULT_MODELS, GeminiClient
+
 # --- FORCE .env LOAD ---
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 ENV_PATH = os.path.join(BASE_DIR, '.env')
@@ -15,26 +16,40 @@ else:
 API_KEY = os.getenv("GEMINI_API_KEY")
 
 if not API_KEY:
-    raise ValueError("⚠️ Gemini API key not found. Please set it in .env at project root.")
-
-genai.configure(api_key=API_KEY)
+    # Not fatal: the stub backend (LLM_BACKEND=stub) works offline, and
+    # Gemini calls raise LLMError until a key is configured.
+    print("⚠️ Gemini API key not found. Please set it in .env at project root.")
+
+# One shared client: models are created once and reused across requests.
+# GEMINI_API_ENDPOINT (e.g. http://127.0.0.1:8080) switches to the REST
+# transport against that host, for running against a local fake server.
+client = GeminiClient(
+    API_KEY,
+    models=[m.strip() for m in os.getenv("GEMINI_MODELS", ",".join(DEFAULT_MODELS)).split(",") if m.strip()],
+    timeout=float(os.getenv("GEMINI_TIMEOUT", "30")),
+    max_retries=int(os.getenv("GEMINI_MAX_RETRIES", "3")),
+    max_concurrency=int(os.getenv("GEMINI_MAX_CONCURRENCY", "8")),
+    api_endpoint=os.getenv("GEMINI_API_ENDPOINT") or None,
+)
+
+
+def stream_answer(prompt: str):
+    """
+    Sends a prompt to Gemini and yields the answer text piece by piece
+    as it is generated. Raises LLMError on failure.
+    """
+    return client.stream(prompt)
 
 
 def generate_answer(prompt: str) -> str:
     """
     Sends a prompt to Gemini and returns the generated text.
     Tries gemini-2.5-flash first, then falls back to gemini-2.5-pro.
+    Raises LLMError once retries and the deadline are exhausted.
     """
-    try:
-        try:
-            # 🧠 Fast model (free tier supported)
-            model = genai.GenerativeModel("models/gemini-2.5-flash")
-        except Exception:
-            # 🧩 fallback if flash not found
-            model = genai.GenerativeModel("models/gemini-2.5-pro")
-
-        response = model.generate_content(prompt)
-        return response.text.strip() if response and response.text else "[No response received from Gemini.]"
-
-    except Exception as e:
-        return f"[Gemini API error: {e}]"
+    return client.generate(prompt)
+
+
+async def generate_answer_async(prompt: str) -> str:
+    """asyncio variant of generate_answer."""
+    return await client.agenerate(prompt)
@@ -0,0 +1,158 @@
+# chatbot/history_writer.py
+import queue
+import threading
+import time
+
+_STOP = object()
+
+
+class HistoryWriter:
+    """
+    Single background writer for chat history.
+
+    Callers enqueue groups of rows (e.g. a question and its answer) on a
+    bounded queue; one thread group-commits them through
+    `write_batch(rows)`, flushing once `batch_size` rows are collected or
+    `flush_interval` seconds after the first row of a batch arrived. When
+    the queue is full, `submit` blocks for up to `put_timeout` seconds
+    (backpressure) before giving up. A failed commit is retried `retries`
+    times, then each submitted group is committed on its own, so a bad row
+    or a lasting lock loses only its own exchange. `close()` drains what is
+    queued.
+    """
+
+    def __init__(self, write_batch, max_queue=10000, batch_size=200, flush_interval=0.2,
+                 put_timeout=0.5, retries=2, retry_delay=0.1, logger=None):
+        self.write_batch = write_batch
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.logger = logger
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._closed = False
+        self.batches = 0
+        self.rows_written = 0
+        self.rows_failed = 0
+        self.rejected = 0
+        self.retried = 0
+        self.last_commit_ms = 0.0
+        self.max_commit_ms = 0.0
+        self._total_commit_ms = 0.0
+
+        self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, rows):
+        """
+        Queues `rows` (a list of dicts) to be written together.
+        Returns False if the writer is closed or stayed full for `put_timeout`.
+        """
+        if not self._closed:
+            try:
+                self._queue.put(list(rows), timeout=self.put_timeout)
+                return True
+            except queue.Full:
+                pass
+        with self._lock:
+            self.rejected += 1
+        if self.logger:
+            self.logger.warning("Chat history queue full or closed; messages not saved")
+        return False
+
+    def _run(self):
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            groups, size = [item], len(item)
+            deadline = time.monotonic() + self.flush_interval
+            while size < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                groups.append(item)
+                size += len(item)
+            self._flush(groups)
+
+    def _write(self, rows, attempts):
+        """Commits `rows`, trying up to `attempts` times; returns the last error or None."""
+        error = None
+        for attempt in range(attempts):
+            if attempt:
+                with self._lock:
+                    self.retried += 1
+                time.sleep(self.retry_delay * 2 ** (attempt - 1))
+            try:
+                self.write_batch(rows)
+                return None
+            except Exception as e:
+                error = e
+        return error
+
+    def _flush(self, groups):
+        start = time.perf_counter()
+        rows = [row for group in groups for row in group]
+        failed = 0
+        error = self._write(rows, self.retries + 1)
+        if error is not None and len(groups) > 1:
+            if self.logger:
+                self.logger.warning(f"Chat history batch of {len(rows)} rows failed ({error}); "
+                                    f"writing its {len(groups)} exchanges one by one")
+            for group in groups:
+                group_error = self._write(group, 1)
+                if group_error is not None:
+                    failed += len(group)
+                    if self.logger:
+                        self.logger.error(f"Chat history exchange of {len(group)} rows not saved: {group_error}")
+        elif error is not None:
+            failed = len(rows)
+            if self.logger:
+                self.logger.error(f"Chat history exchange of {len(rows)} rows not saved: {error}")
+        elapsed = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.batches += 1
+            self.rows_written += len(rows) - failed
+            self.rows_failed += failed
+            self.last_commit_ms = elapsed
+            self.max_commit_ms = max(self.max_commit_ms, elapsed)
+            self._total_commit_ms += elapsed
+
+    def close(self, timeout=10.0):
+        """Stops accepting rows and waits for the queued ones to be written."""
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            if self.logger:
+                self.logger.error("Chat history writer did not drain in time")
+            return
+        self._thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_queue": self._queue.maxsize,
+                "batches": self.batches,
+                "rows_written": self.rows_written,
+                "rows_failed": self.rows_failed,
+                "rejected": self.rejected,
+                "retried": self.retried,
+                "last_commit_ms": round(self.last_commit_ms, 2),
+                "avg_commit_ms": round(self._total_commit_ms / self.batches, 2) if self.batches else 0.0,
+                "max_commit_ms": round(self.max_commit_ms, 2),
+            }
@@ -0,0 +1,132 @@
+# chatbot/indexer.py
+import hashlib
+import json
+import os
+import threading
+
+from loader import iter_pdf_pages_parallel
+from embedder import embed_chunk_stream, model
+from chunker import CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS, TokenChunker
+from vector_store import VectorStore
+
+MANIFEST_FILE = "manifest.json"
+# "auto" picks a FAISS backend from the chunk count; see vector_store.INDEX_TYPES.
+VECTOR_INDEX_TYPE = os.getenv("VECTOR_INDEX_TYPE", "auto")
+
+
+def file_digest(file_path: str, block_size: int = 1 << 20) -> str:
+    """
+    Returns the SHA-256 hex digest of a file's contents.
+    Identical uploads share one digest no matter what they are called.
+    """
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+PREVIEW_LENGTH = 800
+
+
+def build_index(file_path: str, max_tokens: int = CHUNK_MAX_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+                progress=None, batch_size: int = 256) -> VectorStore:
+    """
+    Runs the extract → chunk → embed → FAISS pipeline for one PDF as a stream:
+    pages are cut into token-sized, overlapping chunks as they are read and
+    embedded `batch_size` chunks at a time, so peak memory is one batch
+    rather than the whole document.
+    `progress(stage, percent)` reports the current stage
+    ("extract", "embed" — which includes chunking — or "index") and how far
+    into it we are.
+    """
+    report = progress or (lambda stage, percent: None)
+    state = {"pages_read": 0, "page_count": 0, "embedded": False}
+    preview = []
+
+    def on_page(done, total):
+        state["pages_read"], state["page_count"] = done, total
+        if not state["embedded"]:
+            report("extract", 100.0 * done / total if total else 100.0)
+
+    def pages():
+        length = 0
+        for page_number, text in iter_pdf_pages_parallel(file_path, progress=on_page):
+            if length < PREVIEW_LENGTH:
+                preview.append(text[:PREVIEW_LENGTH - length])
+                length += len(preview[-1]) + 1
+            yield page_number, text
+
+    report("extract", 0.0)
+    store = VectorStore(embedding_dim=model.get_sentence_embedding_dimension())
+    chunker = TokenChunker(model.tokenizer, max_tokens=max_tokens, overlap_tokens=overlap_tokens)
+    chunks = chunker.chunk_pages(pages())
+    for texts, metas, embeddings in embed_chunk_stream(chunks, batch_size=batch_size):
+        store.add(texts, embeddings, metas)
+        state["embedded"] = True
+        total = state["page_count"]
+        report("embed", 100.0 * state["pages_read"] / total if total else 100.0)
+
+    report("index", 0.0)
+    store.optimize(VECTOR_INDEX_TYPE)
+    text_preview = "\n".join(preview)[:PREVIEW_LENGTH]
+    store.metadata = {"preview": text_preview or "[No readable text found in PDF.]"}
+    return store
+
+
+class DocumentManifest:
+    """
+    Persistent per-user filename → content digest mapping, plus which users
+    uploaded which digests. Lets /chat find the shared index of a document
+    by the name its owner uploaded it under, and lists the documents a user
+    can search. Names are private: another user's "report.pdf" neither
+    replaces nor reveals yours.
+    """
+
+    def __init__(self, index_folder: str):
+        self.path = os.path.join(index_folder, MANIFEST_FILE)
+        self._lock = threading.Lock()
+        self._entries = {}  # owner → {filename → digest}
+        self._owners = {}   # owner → [digest, ...]
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == 2:
+                self._entries = data["files"]
+                self._owners = data["owners"]
+            elif "files" in data and isinstance(data["files"], dict):
+                # Names used to be global: keep each one for the users who
+                # uploaded that content. Flat legacy maps had no owners at all.
+                self._owners = data.get("owners", {})
+                for filename, digest in data["files"].items():
+                    for owner in self.owners_of(digest):
+                        self._entries.setdefault(owner, {})[filename] = digest
+
+    def get(self, owner, filename):
+        """Digest of the document `owner` uploaded as `filename`, or None."""
+        return self._entries.get(str(owner), {}).get(filename)
+
+    def owned(self, owner):
+        """Digests uploaded by `owner`."""
+        return list(self._owners.get(str(owner), []))
+
+    def owners_of(self, digest):
+        """Owners who uploaded a document with these contents."""
+        return [owner for owner, digests in list(self._owners.items()) if digest in digests]
+
+    def set(self, owner, filename, digest):
+        with self._lock:
+            files = self._entries.setdefault(str(owner), {})
+            owned = self._owners.setdefault(str(owner), [])
+            if files.get(filename) == digest and digest in owned:
+                return
+            files[filename] = digest
+            if digest not in owned:
+                owned.append(digest)
+            self._write()
+
+    def _write(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": 2, "files": self._entries, "owners": self._owners}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
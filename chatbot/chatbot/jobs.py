@@ -0,0 +1,158 @@
+# chatbot/jobs.py
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Share of the overall progress bar taken by each indexing stage.
+# Chunking runs interleaved with embedding, so it is part of "embed".
+STAGE_WEIGHTS = OrderedDict([
+    ("extract", 40.0),
+    ("embed", 55.0),
+    ("index", 5.0),
+])
+
+
+class QueueFullError(Exception):
+    """Raised when too many indexing jobs are already waiting."""
+
+
+class IndexingJob:
+    """
+    Progress record for one background indexing run.
+    """
+
+    def __init__(self, key, **info):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.info = info
+        self.status = "queued"  # queued → running → done | error
+        self.stage = "queued"
+        self.stage_percent = 0.0
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self._lock = threading.Lock()
+
+    def update(self, stage, percent):
+        """Progress callback passed into the indexing pipeline."""
+        with self._lock:
+            self.status = "running"
+            self.stage = stage
+            self.stage_percent = max(0.0, min(100.0, float(percent)))
+
+    @property
+    def percent(self):
+        if self.status == "done":
+            return 100.0
+        total = 0.0
+        for stage, weight in STAGE_WEIGHTS.items():
+            if stage == self.stage:
+                return round(total + weight * self.stage_percent / 100.0, 1)
+            total += weight
+        return 0.0
+
+    @property
+    def finished(self):
+        return self.status in ("done", "error")
+
+    def to_dict(self):
+        with self._lock:
+            data = dict(self.info)
+            data.update({
+                "job_id": self.id,
+                "status": self.status,
+                "stage": self.stage,
+                "stage_percent": round(self.stage_percent, 1),
+                "percent": self.percent,
+            })
+            if self.result is not None:
+                data.update(self.result)
+            if self.error is not None:
+                data["error"] = self.error
+            return data
+
+
+class IndexingJobs:
+    """
+    Runs indexing jobs on a bounded thread pool.
+    Jobs are deduplicated by key: submitting a key that is still in flight
+    returns the existing job instead of indexing twice.
+    """
+
+    def __init__(self, max_workers=2, max_queued=16, keep_finished=1000, logger=None):
+        self.max_queued = max_queued
+        self.keep_finished = keep_finished
+        self.logger = logger
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="indexer")
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._in_flight = {}
+
+    def submit(self, key, fn, *args, **info):
+        """
+        Schedules `fn(job, *args)`; its return value (a dict) becomes the job result.
+        Raises QueueFullError when `max_queued` jobs are already waiting.
+        """
+        with self._lock:
+            existing = self._in_flight.get(key)
+            if existing is not None:
+                return existing
+
+            queued = sum(1 for j in self._in_flight.values() if j.status == "queued")
+            if queued >= self.max_queued:
+                raise QueueFullError("Indexing queue is full, try again shortly.")
+
+            job = IndexingJob(key, **info)
+            self._jobs[job.id] = job
+            self._in_flight[key] = job
+            self._prune()
+
+        self._executor.submit(self._run, job, fn, args)
+        return job
+
+    def completed(self, key, result, **info):
+        """Records an already finished job, e.g. for a deduplicated upload."""
+        job = IndexingJob(key, **info)
+        job.status = job.stage = "done"
+        job.stage_percent = 100.0
+        job.result = result
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        return job
+
+    def _run(self, job, fn, args):
+        try:
+            result = fn(job, *args)
+            with job._lock:
+                job.result = result
+                job.status = job.stage = "done"
+                job.stage_percent = 100.0
+        except Exception as e:
+            if self.logger:
+                self.logger.exception(f"Indexing job {job.id} failed: {e}")
+            with job._lock:
+                job.error = str(e)
+                job.status = "error"
+        finally:
+            with self._lock:
+                if self._in_flight.get(job.key) is job:
+                    del self._in_flight[job.key]
+
+    def _prune(self):
+        """Forgets the oldest finished jobs once more than `keep_finished` are held."""
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def pending(self, key):
+        """Returns the in-flight job for `key`, or None."""
+        return self._in_flight.get(key)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
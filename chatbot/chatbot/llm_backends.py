@@ -0,0 +1,72 @@
+# chatbot/llm_backends.py
+import hashlib
+import os
+import threading
+import time
+
+from llm_client import LLMBackend
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+BACKENDS = ("gemini", "stub")
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+class StubBackend(LLMBackend):
+    """
+    Local, deterministic stand-in for the LLM, for load tests and offline
+    benchmarks. Waits `latency` seconds before answering (and `token_latency`
+    between streamed words), then returns `answer_words` words picked from
+    the prompt by its hash, so the same prompt always gets the same answer.
+    """
+
+    name = "stub"
+
+    def __init__(self, latency=0.2, token_latency=0.0, answer_words=60):
+        self.latency = latency
+        self.token_latency = token_latency
+        self.answer_words = answer_words
+
+    def _words(self, prompt):
+        digest = hashlib.sha1(prompt.encode("utf-8")).hexdigest()
+        words = prompt.split() or ["stub"]
+        seed = int(digest[:8], 16)
+        picked = [words[(seed + i * 7919) % len(words)] for i in range(self.answer_words)]
+        return [f"[stub {digest[:8]}]"] + picked
+
+    def generate(self, prompt, timeout=None):
+        words = self._words(prompt)
+        time.sleep(self.latency + self.token_latency * len(words))
+        return " ".join(words)
+
+    def stream(self, prompt, timeout=None):
+        time.sleep(self.latency)
+        for i, word in enumerate(self._words(prompt)):
+            if self.token_latency:
+                time.sleep(self.token_latency)
+            yield word if i == 0 else " " + word
+
+
+def create_backend(name=None):
+    """Builds the LLM backend called `name` (default: the LLM_BACKEND env var)."""
+    name = (name or LLM_BACKEND).strip().lower()
+    if name == "gemini":
+        from gemini_client import client
+        return client
+    if name == "stub":
+        return StubBackend(
+            latency=float(os.getenv("LLM_STUB_LATENCY_MS", "200")) / 1000,
+            token_latency=float(os.getenv("LLM_STUB_TOKEN_LATENCY_MS", "0")) / 1000,
+            answer_words=int(os.getenv("LLM_STUB_ANSWER_WORDS", "60")),
+        )
+    raise ValueError(f"Unknown LLM backend {name!r}; expected one of {', '.join(BACKENDS)}")
+
+
+def get_backend():
+    """The process-wide backend chosen by configuration, created on first use."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_backend()
+        return _backend
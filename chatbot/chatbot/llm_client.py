@@ -0,0 +1,213 @@
+# chatbot/llm_client.py
+import abc
+import asyncio
+import random
+import threading
+import time
+
+import google.generativeai as genai
+
+try:
+    from google.api_core import exceptions as api_exceptions
+except ImportError:  # api_core ships with google-generativeai; be defensive anyway
+    api_exceptions = None
+
+DEFAULT_MODELS = ("models/gemini-2.5-flash", "models/gemini-2.5-pro")
+
+
+class LLMError(Exception):
+    """The language model could not produce an answer."""
+
+
+class LLMTimeoutError(LLMError):
+    """A call did not finish within its deadline."""
+
+
+class LLMBusyError(LLMError):
+    """Too many calls were already in flight for the whole deadline."""
+
+
+def _transient_errors():
+    errors = (ConnectionError, TimeoutError)
+    if api_exceptions is not None:
+        errors += (
+            api_exceptions.TooManyRequests,
+            api_exceptions.ServiceUnavailable,
+            api_exceptions.InternalServerError,
+            api_exceptions.DeadlineExceeded,
+        )
+    return errors
+
+
+def _is_not_found(error):
+    return api_exceptions is not None and isinstance(error, api_exceptions.NotFound)
+
+
+class LLMBackend(abc.ABC):
+    """
+    Interface the RAG pipeline talks to. Backends implement `generate`;
+    `stream` and `agenerate` fall back to it. Every method raises LLMError
+    on failure.
+    """
+
+    name = "base"
+
+    @abc.abstractmethod
+    def generate(self, prompt, timeout=None):
+        """Returns the generated text."""
+
+    def stream(self, prompt, timeout=None):
+        """Yields the answer text piece by piece."""
+        yield self.generate(prompt, timeout)
+
+    async def agenerate(self, prompt, timeout=None):
+        """asyncio API: runs `generate` on a worker thread."""
+        return await asyncio.to_thread(self.generate, prompt, timeout)
+
+
+class GeminiClient(LLMBackend):
+    """
+    Reusable Gemini client.
+
+    Keeps one configured GenerativeModel per model name, gives every call a
+    deadline, retries transient failures with jittered exponential backoff,
+    and caps concurrent in-flight requests with a semaphore. Models are tried
+    in order, moving on when one is not found. `api_endpoint` points the REST
+    transport elsewhere, e.g. at a local fake server in tests. Without an
+    API key, construction still succeeds and each call raises LLMError.
+    """
+
+    name = "gemini"
+
+    def __init__(self, api_key, models=DEFAULT_MODELS, timeout=30.0, max_retries=3,
+                 backoff_base=0.5, backoff_max=8.0, max_concurrency=8, api_endpoint=None):
+        self.api_key = api_key
+        self.models = tuple(models)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._models = {}
+        self._models_lock = threading.Lock()
+        self._transient = _transient_errors()
+
+        if api_key:
+            options = {"api_key": api_key}
+            if api_endpoint:
+                options.update(transport="rest", client_options={"api_endpoint": api_endpoint})
+            genai.configure(**options)
+
+    def model(self, name):
+        """The shared GenerativeModel for `name`, created on first use."""
+        with self._models_lock:
+            model = self._models.get(name)
+            if model is None:
+                model = self._models[name] = genai.GenerativeModel(name)
+            return model
+
+    def _backoff(self, attempt):
+        """Full-jitter exponential backoff delay for retry number `attempt`."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _acquire(self, timeout):
+        """Takes a concurrency slot; returns the call's (timeout, deadline)."""
+        if not self.api_key:
+            raise LLMError("Gemini API key not found. Please set GEMINI_API_KEY in .env at project root.")
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        if not self._slots.acquire(timeout=timeout):
+            raise LLMBusyError(f"No free LLM slot within {timeout:.0f}s")
+        return timeout, deadline
+
+    def _attempt(self, fn, timeout, deadline):
+        """
+        Runs `fn(model, remaining_seconds)` with retries on transient errors
+        and fallback across models, until `deadline`. The caller holds a slot.
+        """
+        last_error = None
+        for name in self.models:
+            for attempt in range(self.max_retries + 1):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise LLMTimeoutError(f"LLM call exceeded {timeout:.0f}s") from last_error
+                try:
+                    return fn(self.model(name), remaining)
+                except self._transient as e:
+                    last_error = e
+                    if attempt < self.max_retries:
+                        time.sleep(min(self._backoff(attempt), max(0.0, deadline - time.monotonic())))
+                except Exception as e:
+                    if _is_not_found(e):
+                        last_error = e
+                        break
+                    raise LLMError(str(e)) from e
+            else:
+                # Retries exhausted on a transient error: don't hammer the next model.
+                break
+        raise LLMError(f"LLM call failed: {last_error}") from last_error
+
+    def _call(self, fn, timeout):
+        """Runs `fn` as in `_attempt`, inside a concurrency slot and one overall deadline."""
+        timeout, deadline = self._acquire(timeout)
+        try:
+            return self._attempt(fn, timeout, deadline)
+        finally:
+            self._slots.release()
+
+    def generate(self, prompt, timeout=None):
+        """Returns the generated text; raises LLMError on failure."""
+        def call(model, remaining):
+            response = model.generate_content(prompt, request_options={"timeout": remaining})
+            try:
+                text = response.text
+            except ValueError as e:
+                raise LLMError(f"Empty or blocked response: {e}") from e
+            if not text or not text.strip():
+                raise LLMError("No response received from Gemini.")
+            return text.strip()
+
+        return self._call(call, timeout)
+
+    def stream(self, prompt, timeout=None):
+        """
+        Yields the answer text piece by piece. The request (and its retries)
+        happens before the first piece; failures after that raise LLMError.
+        The concurrency slot and the deadline cover the whole stream, until
+        it is exhausted or closed.
+        """
+        def call(model, remaining):
+            return model.generate_content(prompt, stream=True, request_options={"timeout": remaining})
+
+        timeout, deadline = self._acquire(timeout)
+        try:
+            response = self._attempt(call, timeout, deadline)
+            received = False
+            try:
+                for chunk in response:
+                    if time.monotonic() > deadline:
+                        raise LLMTimeoutError(f"LLM stream exceeded {timeout:.0f}s")
+                    try:
+                        text = chunk.text
+                    except ValueError:
+                        # Chunks without text parts (e.g. only safety ratings)
+                        continue
+                    if text:
+                        received = True
+                        yield text
+            except LLMError:
+                raise
+            except Exception as e:
+                raise LLMError(str(e)) from e
+            if not received:
+                raise LLMError("No response received from Gemini.")
+        finally:
+            self._slots.release()
+
+    async def agenerate(self, prompt, timeout=None):
+        """asyncio API: runs `generate` on a worker thread under the same limits."""
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            return await asyncio.wait_for(asyncio.to_thread(self.generate, prompt, timeout), timeout + 1.0)
+        except asyncio.TimeoutError as e:
+            raise LLMTimeoutError(f"LLM call exceeded {timeout:.0f}s") from e
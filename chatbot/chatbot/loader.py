@@ -1,17 +1,136 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
 import pdfplumber
 
-def extract_text_from_pdf(file_path: str) -> str:
+# Parallel extraction settings; small files stay serial because starting
+# worker processes costs more than it saves.
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+EXTRACT_BATCH_PAGES = int(os.getenv("EXTRACT_BATCH_PAGES", "16"))
+PARALLEL_MIN_PAGES = int(os.getenv("PARALLEL_MIN_PAGES", "48"))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def iter_pdf_pages(file_path: str, start: int = 0, end: int = None, progress=None):
+    """
+    Streams text out of a PDF one page at a time.
+    Yields (page_number, text) for pages [start, end), numbered from 1;
+    pages without extractable text are skipped.
+    `progress(pages_done, page_count)` is called after each page, if given.
+    """
+    with pdfplumber.open(file_path) as pdf:
+        page_count = len(pdf.pages)
+        end = page_count if end is None else min(end, page_count)
+        for page_number in range(start + 1, end + 1):
+            page = pdf.pages[page_number - 1]
+            page_text = page.extract_text()
+            # Drop pdfplumber's cached layout objects so memory stays per-page.
+            page.flush_cache()
+            if page_text:
+                yield page_number, page_text
+            if progress:
+                progress(page_number - start, end - start)
+
+
+def page_count(file_path: str) -> int:
+    with pdfplumber.open(file_path) as pdf:
+        return len(pdf.pages)
+
+
+def _extract_page_range(file_path, start, end):
+    """Worker entry point: returns [(page_number, text), ...] for one batch."""
+    return list(iter_pdf_pages(file_path, start, end))
+
+
+def start_extract_pool(workers: int = None):
+    """
+    Starts the shared extraction pool, once per process, and returns it
+    (None when extraction runs serially).
+
+    Workers are forked right away and reused for every upload. Call this
+    early, before the embedding model or any threads exist, so they start
+    small: spawn/forkserver workers would instead re-import the launching
+    script (app.py) and start a second copy of the whole app in each one.
+    Without fork (Windows), extraction stays serial.
+    """
+    global _pool
+    workers = workers or EXTRACT_WORKERS
+    with _pool_lock:
+        if _pool is None and workers > 1 and "fork" in multiprocessing.get_all_start_methods():
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork"))
+            # With fork, the first submit forks every worker at once: do it now.
+            for future in [pool.submit(os.getpid) for _ in range(workers)]:
+                future.result()
+            _pool = pool
+        return _pool
+
+
+def _discard_pool(pool):
+    """Drops a broken pool; the next parallel extraction starts a fresh one."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_pdf_pages_parallel(file_path: str, batch_size: int = None, progress=None):
+    """
+    Same stream as `iter_pdf_pages`, but pages are extracted in batches of
+    `batch_size` on the shared worker pool (see `start_extract_pool`) and
+    yielded back in page order. Falls back to serial extraction for small
+    documents or when there is no pool.
+    """
+    batch_size = batch_size or EXTRACT_BATCH_PAGES
+    total = page_count(file_path)
+    pool = None
+    if total >= max(PARALLEL_MIN_PAGES, 2 * batch_size):
+        pool = start_extract_pool()
+    if pool is None:
+        yield from iter_pdf_pages(file_path, progress=progress)
+        return
+
+    ranges = [(start, min(start + batch_size, total)) for start in range(0, total, batch_size)]
+    # Keep only a bounded window of batches in flight so results are
+    # consumed (and freed) roughly as fast as they are produced.
+    window = EXTRACT_WORKERS * 2
+    pending = []
+    try:
+        for start, end in ranges:
+            pending.append((pool.submit(_extract_page_range, file_path, start, end), end))
+            if len(pending) >= window:
+                yield from _drain_first(pending, total, progress)
+        while pending:
+            yield from _drain_first(pending, total, progress)
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        raise
+    finally:
+        for future, _ in pending:
+            future.cancel()
+
+
+def _drain_first(pending, total, progress):
+    """Yields the oldest in-flight batch, preserving page order."""
+    future, end = pending.pop(0)
+    yield from future.result()
+    if progress:
+        progress(end, total)
+
+
+def extract_text_from_pdf(file_path: str, progress=None) -> str:
     """
     Extracts text content from a PDF file.
+    `progress(pages_done, page_count)` is called after each page, if given.
     Returns the text as a single string.
     """
-    text = ""
     try:
-        with pdfplumber.open(file_path) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
+        text = "".join(page_text + "\n" for _, page_text in iter_pdf_pages(file_path, progress=progress))
         if not text.strip():
             text = "[No readable text found in PDF.]"
     except Exception as e:
@@ -4,6 +4,8 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 
+from auth import DEFAULT_HASH_METHOD
+
 db = SQLAlchemy()
 
 
@@ -14,8 +16,8 @@ class User(UserMixin, db.Model):
     password_hash = db.Column(db.String(256), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-    def set_password(self, password: str):
-        self.password_hash = generate_password_hash(password)
+    def set_password(self, password: str, method: str = DEFAULT_HASH_METHOD):
+        self.password_hash = generate_password_hash(password, method)
 
     def check_password(self, password: str) -> bool:
         return check_password_hash(self.password_hash, password)
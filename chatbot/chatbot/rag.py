@@ -1,21 +1,19 @@
 # chatbot/rag.py
-from embedder import embed_chunks
-from gemini_client import generate_answer
+from context_budget import ContextBudgeter
+from embedder import embed_chunks, embed_query, model
+from llm_backends import get_backend
+from retrieval import MULTI_QUERY_HYDE, RETRIEVAL_MODE, hybrid_search, multi_query_search, query_variants
 
-def answer_question(query, store, top_k=3):
-    """
-    Retrieves relevant chunks and uses Gemini to answer.
-    Returns dict: {"answer": str, "context_used": [{chunk, score}, ...]}
-    """
-    # 1) embed query
-    q_embed = embed_chunks([query])  # returns numpy array shape (1, dim)
+# Token counts use the embedding model's tokenizer: a close, local proxy
+# for what the LLM is billed on.
+BUDGETER = ContextBudgeter(model.tokenizer)
 
-    # 2) retrieve from store
-    results = store.search(q_embed, top_k=top_k)
 
-    # 3) build context and prompt
-    context = "\n\n".join([r["chunk"] for r in results])
-    prompt = f"""You are an assistant that answers using the provided document context. If the answer is not present, reply: "I couldn't find that information in the document. but give a relevant answer, also frame the answer nicely, if asked to code, please provide the code. dont make text bold"
+def build_prompt(query, results):
+    context = "\n\n".join(
+        f"[Page {r['page']}] {r['chunk']}" if r.get("page") else r["chunk"] for r in results
+    )
+    return f"""You are an assistant that answers using the provided document context. If the answer is not present, reply: "I couldn't find that information in the document. but give a relevant answer, also frame the answer nicely, if asked to code, please provide the code. dont make text bold"
 
 Context:
 {context}
@@ -23,7 +21,126 @@ Context:
 Question: {query}
 Answer:"""
 
-    # 4) call Gemini
-    answer = generate_answer(prompt)
 
-    return {"answer": answer, "context_used": results}
+def retrieve(query, q_embed, store, top_k=3, min_score=None, mode=RETRIEVAL_MODE, reranker=None, backend=None):
+    """
+    Returns the ranked chunks for a question: dense, hybrid, or "multi"
+    (several rewrites of the question, embedded in one batch, searched in
+    one batched call and fused; `backend` writes the HyDE variant when
+    MULTI_QUERY_HYDE is on). With a reranker, `reranker.candidates` hits
+    are fetched and re-scored, and the best `top_k` of those are kept.
+    """
+    fetch_k = max(top_k, reranker.candidates) if reranker is not None else top_k
+    if mode == "multi":
+        hyde_backend = (backend or get_backend()) if MULTI_QUERY_HYDE else None
+        queries = [query, *query_variants(query, backend=hyde_backend)]
+        # The question's own embedding comes back from the embedding cache
+        embeddings = embed_chunks(queries) if len(queries) > 1 else q_embed
+        results = multi_query_search(store, queries, embeddings, top_k=fetch_k, min_score=min_score)
+    elif mode == "hybrid":
+        results = hybrid_search(store, query, q_embed, top_k=fetch_k, min_score=min_score)
+    else:
+        results = store.search(q_embed, top_k=fetch_k, min_score=min_score)
+    if reranker is not None:
+        return reranker.rerank(query, results, top_k)
+    return results
+
+
+def prepare_prompt(query, results):
+    """
+    Packs `results` under the context token budget and builds the prompt.
+    Returns (packed results, prompt, token counts).
+    """
+    packed, context_tokens = BUDGETER.pack(results)
+    prompt = build_prompt(query, packed)
+    return packed, prompt, {"context_tokens": context_tokens, "prompt_tokens": BUDGETER.count(prompt)}
+
+
+# Nothing is sent to the LLM for an answer served from the cache
+_CACHED_TOKENS = {"context_tokens": 0, "prompt_tokens": 0}
+
+
+def _citations(results):
+    return [
+        {"page": r.get("page"), "start": r.get("start"), "end": r.get("end"), "score": r["score"]}
+        for r in results
+    ]
+
+
+def answer_question(query, store, top_k=3, min_score=None, mode=RETRIEVAL_MODE, cache=None, cache_key=None,
+                    backend=None, reranker=None):
+    """
+    Retrieves relevant chunks and uses the LLM backend (default: the
+    configured one, see llm_backends) to answer.
+    `mode` is "dense" (embeddings only), "hybrid" (embeddings + BM25, fused)
+    or "multi" (hybrid over several rewrites of the question, see `retrieve`).
+    An optional CrossEncoderReranker re-orders an over-fetched candidate set.
+    Chunks whose similarity is below `min_score` are left out of the prompt,
+    and the rest are packed under the context token budget (see context_budget).
+    With an AnswerCache, repeated and near-duplicate questions for `cache_key`
+    are answered from the cache without retrieval or an LLM call.
+    Raises LLMError when the LLM fails, so failures are never cached.
+    Returns dict: {"answer": str, "context_used": [{chunk, score, page, ...}, ...],
+                   "citations": [{page, start, end, score}, ...], "cached": bool,
+                   "context_tokens": int, "prompt_tokens": int}
+    """
+    # 1) embed query
+    q_embed = embed_query(query)  # returns numpy array shape (1, dim)
+
+    if cache is not None:
+        cached = cache.lookup(cache_key, query, q_embed)
+        if cached is not None:
+            return dict(cached, cached=True, **_CACHED_TOKENS)
+
+    # 2) retrieve from store
+    results = retrieve(query, q_embed, store, top_k=top_k, min_score=min_score, mode=mode, reranker=reranker,
+                       backend=backend)
+
+    # 3) pack the context, build the prompt and call the LLM
+    results, prompt, tokens = prepare_prompt(query, results)
+    answer = (backend or get_backend()).generate(prompt)
+
+    result = {"answer": answer, "context_used": results, "citations": _citations(results), "cached": False, **tokens}
+    if cache is not None:
+        cache.store(cache_key, query, q_embed, result)
+    return result
+
+
+def stream_answer_question(query, store, top_k=3, min_score=None, mode=RETRIEVAL_MODE, cache=None, cache_key=None,
+                           backend=None, reranker=None):
+    """
+    Streaming variant of `answer_question`. Yields (event, data) pairs:
+    ("context", {"context_used", "citations", "cached", "prompt_tokens"}) once
+    the prompt is assembled,
+    ("token", str) for each piece of the answer as the LLM produces it, and
+    ("done", result) with the same dict `answer_question` returns.
+    LLMError propagates if the LLM fails, before or during the answer.
+    """
+    q_embed = embed_query(query)
+
+    if cache is not None:
+        cached = cache.lookup(cache_key, query, q_embed)
+        if cached is not None:
+            result = dict(cached, cached=True, **_CACHED_TOKENS)
+            yield "context", {k: result[k] for k in ("context_used", "citations", "cached", "prompt_tokens")}
+            yield "token", result["answer"]
+            yield "done", result
+            return
+
+    results = retrieve(query, q_embed, store, top_k=top_k, min_score=min_score, mode=mode, reranker=reranker,
+                       backend=backend)
+    results, prompt, tokens = prepare_prompt(query, results)
+    citations = _citations(results)
+    yield "context", {"context_used": results, "citations": citations, "cached": False,
+                      "prompt_tokens": tokens["prompt_tokens"]}
+
+    pieces = []
+    for piece in (backend or get_backend()).stream(prompt):
+        pieces.append(piece)
+        yield "token", piece
+
+    answer = "".join(pieces).strip()
+    result = {"answer": answer, "context_used": results, "citations": citations, "cached": False, **tokens}
+    if cache is not None and answer:
+        cache.store(cache_key, query, q_embed, result)
+    yield "done", result
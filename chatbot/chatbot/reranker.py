@@ -0,0 +1,124 @@
+# chatbot/reranker.py
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from answer_cache import normalize_question
+
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "50"))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "300"))
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "20000"))
+
+
+def _text_key(text):
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+
+
+class CrossEncoderReranker:
+    """
+    Re-orders over-fetched retrieval hits with a small local cross-encoder.
+
+    Retrieval asks for `candidates` hits; they are scored in batches of
+    `batch_size` (query, chunk) pairs, best retrieval rank first, until
+    the latency budget runs out. Scored hits come first, best cross-encoder
+    score first, followed by any unscored ones in retrieval order. Scores
+    are cached per (normalized question, chunk text), so repeated questions
+    and overlapping candidate sets skip the model.
+    """
+
+    def __init__(self, model_name=RERANK_MODEL, candidates=RERANK_CANDIDATES, batch_size=RERANK_BATCH_SIZE,
+                 budget_ms=RERANK_BUDGET_MS, cache_size=RERANK_CACHE_SIZE):
+        self.model_name = model_name
+        self.candidates = candidates
+        self.batch_size = batch_size
+        self.budget_ms = budget_ms
+        self.cache_size = cache_size
+
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._scores = OrderedDict()  # (question, chunk key) → score
+        self.calls = 0
+        self.pairs_scored = 0
+        self.cache_hits = 0
+        self.over_budget = 0
+        self.total_ms = 0.0
+
+    @property
+    def model(self):
+        """The CrossEncoder, loaded on first use."""
+        with self._model_lock:
+            if self._model is None:
+                from sentence_transformers import CrossEncoder
+                self._model = CrossEncoder(self.model_name)
+            return self._model
+
+    def _cached(self, keys):
+        with self._lock:
+            scores = {}
+            for key in keys:
+                score = self._scores.get(key)
+                if score is not None:
+                    self._scores.move_to_end(key)
+                    scores[key] = score
+            self.cache_hits += len(scores)
+            return scores
+
+    def _remember(self, scores):
+        with self._lock:
+            self._scores.update(scores)
+            while len(self._scores) > self.cache_size:
+                self._scores.popitem(last=False)
+
+    def rerank(self, query, results, top_k):
+        """Returns the `top_k` best of `results`, each with a "rerank_score" when scored."""
+        if not results:
+            return []
+        start = time.perf_counter()
+        deadline = start + self.budget_ms / 1000
+        question = normalize_question(query)
+        keys = [(question, _text_key(r["chunk"])) for r in results]
+        scores = self._cached(keys)
+
+        missing = [i for i, key in enumerate(keys) if key not in scores]
+        for n in range(0, len(missing), self.batch_size):
+            if n and time.perf_counter() >= deadline:
+                with self._lock:
+                    self.over_budget += 1
+                break
+            batch = missing[n:n + self.batch_size]
+            predicted = self.model.predict(
+                [(query, results[i]["chunk"]) for i in batch],
+                batch_size=len(batch), show_progress_bar=False,
+            )
+            fresh = {keys[i]: float(s) for i, s in zip(batch, predicted)}
+            scores.update(fresh)
+            self._remember(fresh)
+            with self._lock:
+                self.pairs_scored += len(batch)
+
+        scored = sorted(
+            (dict(r, rerank_score=scores[key]) for r, key in zip(results, keys) if key in scores),
+            key=lambda r: r["rerank_score"], reverse=True,
+        )
+        unscored = [r for r, key in zip(results, keys) if key not in scores]
+        with self._lock:
+            self.calls += 1
+            self.total_ms += (time.perf_counter() - start) * 1000
+        return (scored + unscored)[:top_k]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "model": self.model_name,
+                "calls": self.calls,
+                "pairs_scored": self.pairs_scored,
+                "cache_hits": self.cache_hits,
+                "cache_entries": len(self._scores),
+                "over_budget": self.over_budget,
+                "avg_ms": round(self.total_ms / self.calls, 2) if self.calls else 0.0,
+            }
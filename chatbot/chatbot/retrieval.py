@@ -0,0 +1,153 @@
+# chatbot/retrieval.py
+import os
+import re
+
+import numpy as np
+
+from bm25 import tokenize
+from llm_client import LLMError
+
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")  # "dense", "hybrid" or "multi"
+RRF_K = int(os.getenv("RRF_K", "60"))
+MULTI_QUERY_MAX_VARIANTS = int(os.getenv("MULTI_QUERY_MAX_VARIANTS", "4"))
+MULTI_QUERY_HYDE = os.getenv("MULTI_QUERY_HYDE", "0") == "1"
+HYDE_TIMEOUT = float(os.getenv("HYDE_TIMEOUT", "5"))
+# A BM25 hit must share a term with the question that occurs in at most this
+# fraction of the chunks; hits on common words only are dropped.
+LEXICAL_MAX_DF = float(os.getenv("LEXICAL_MAX_DF", "0.05"))
+
+_STOPWORDS = frozenset("""
+a about an and any are as at be been but by can could did do does for from had has have how i if in
+into is it its me my of on or please should so tell than that the their them then there these they
+this to was we were what when where which who whom why will with would you your
+""".split())
+
+# Splits "What is X and how does Y work?" into its sub-questions.
+_SUBQUESTION = re.compile(
+    r"\?\s+|;\s*|\s+(?:and|also|as well as)\s+(?=(?:what|how|why|when|where|which|who|is|are|does|do|can|list|explain|describe)\b)",
+    re.IGNORECASE,
+)
+
+
+def _result_key(result):
+    # Corpus hits carry the document they came from; chunk ids repeat across documents.
+    return result.get("doc"), result["id"]
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K, top_k=None):
+    """
+    Fuses several ranked result lists with Reciprocal Rank Fusion:
+    rrf(d) = Σ 1 / (k + rank of d in each list).
+    Each fused hit keeps the fields of its first occurrence, including its
+    "score" (similarity to the question, shown in citations), and gets the
+    fused value as "rrf_score", which the result is ordered by.
+    `rankings` maps a source name ("dense", "lexical", ...) to its list.
+    """
+    fused = {}
+    for results in rankings.values():
+        for rank, result in enumerate(results, start=1):
+            key = _result_key(result)
+            entry = fused.get(key)
+            if entry is None:
+                entry = fused[key] = dict(result)
+                entry["rrf_score"] = 0.0
+            entry["rrf_score"] += 1.0 / (k + rank)
+    ranked = sorted(fused.values(), key=lambda r: r["rrf_score"], reverse=True)
+    return ranked[:top_k] if top_k is not None else ranked
+
+
+def lexical_hits(store, query, query_embedding, candidates=50, max_df=LEXICAL_MAX_DF):
+    """
+    BM25 hits for the content words of `query` (stopwords would match nearly
+    every chunk). Only chunks sharing a rare term with the question count
+    (see `BM25Index.search`): those are the exact identifiers dense search
+    misses, so they are not held to its `min_score`. Each hit is re-scored
+    against `query_embedding`, so "score" means the same as for dense hits;
+    the BM25 score is kept as "bm25_score".
+    Returns [] for stores without a sparse index.
+    """
+    lexical_search = getattr(store, "lexical_search", None)
+    keywords = keyword_query(query)
+    if lexical_search is None or not keywords:
+        return []
+    hits = lexical_search(keywords, top_k=candidates, max_df=max_df)
+    scores = store.similarities(query_embedding, [hit["id"] for hit in hits])
+    return [dict(hit, score=score, bm25_score=hit["score"]) for hit, score in zip(hits, scores)]
+
+
+def hybrid_search(store, query, query_embedding, top_k=3, min_score=None, candidates=50):
+    """
+    Dense + BM25 retrieval fused with RRF. Each side contributes up to
+    `candidates` hits: dense ones above `min_score`, lexical ones on a rare
+    term (see `lexical_hits`). Stores without a sparse index fall back to
+    dense only.
+    """
+    dense = store.search(query_embedding, top_k=max(top_k, candidates), min_score=min_score)
+    lexical = lexical_hits(store, query, query_embedding, candidates=candidates)
+    if not lexical:
+        return dense[:top_k]
+    return reciprocal_rank_fusion({"dense": dense, "lexical": lexical}, top_k=top_k)
+
+
+def keyword_query(query):
+    """The question reduced to its distinct content words."""
+    words = []
+    for word in tokenize(query):
+        if word not in _STOPWORDS and word not in words:
+            words.append(word)
+    return " ".join(words)
+
+
+def split_subquestions(query):
+    """Sub-questions of a compound question; empty if there is only one."""
+    parts = [p.strip(" ,.?") for p in _SUBQUESTION.split(query)]
+    parts = [p + "?" for p in parts if len(p.split()) >= 2]
+    return parts if len(parts) > 1 else []
+
+
+def hyde_passage(query, backend):
+    """
+    HyDE expansion: a short hypothetical answer written by the LLM, which
+    tends to sit closer to the relevant chunks than the question does.
+    Returns None if the LLM fails or is slow, so retrieval never waits on it.
+    """
+    prompt = (
+        "Write a short, factual passage (2-3 sentences) that could appear in a document "
+        f"and answers this question. Do not mention the question.\n\nQuestion: {query}\nPassage:"
+    )
+    try:
+        return backend.generate(prompt, timeout=HYDE_TIMEOUT)
+    except LLMError:
+        return None
+
+
+def query_variants(query, backend=None, max_variants=MULTI_QUERY_MAX_VARIANTS):
+    """
+    Rewrites of `query` for multi-query retrieval (the query itself excluded):
+    its keywords, its sub-questions and, given an LLM backend, a HyDE passage.
+    """
+    variants = [keyword_query(query), *split_subquestions(query)]
+    if backend is not None:
+        variants.append(hyde_passage(query, backend))
+
+    seen, unique = {query.strip().lower()}, []
+    for variant in variants:
+        if variant and variant.strip().lower() not in seen:
+            seen.add(variant.strip().lower())
+            unique.append(variant.strip())
+    return unique[:max_variants]
+
+
+def multi_query_search(store, queries, query_embeddings, top_k=3, min_score=None, candidates=50):
+    """
+    Searches every query variant at once, dense in a single `search_batch`
+    call plus BM25 per variant when the store has a sparse index, and fuses
+    all the lists with RRF. `query_embeddings` has one row per query.
+    """
+    dense = store.search_batch(query_embeddings, top_k=max(top_k, candidates), min_score=min_score)
+    rankings = {f"dense_{i}": results for i, results in enumerate(dense)}
+    # Lexical hits of every variant are scored against the original question
+    question_embedding = np.array(query_embeddings, dtype="float32", ndmin=2)[0]
+    for i, query in enumerate(queries):
+        rankings[f"lexical_{i}"] = lexical_hits(store, query, question_embedding, candidates=candidates)
+    return reciprocal_rank_fusion({k: v for k, v in rankings.items() if v}, top_k=top_k)
@@ -175,24 +175,32 @@ document.addEventListener("DOMContentLoaded", () => {
 
     const fd = new FormData();
     fd.append("file", fileInput.files[0]);
-    uploadResponse.innerHTML = "<p>⏳ Uploading and indexing...</p>";
+    uploadResponse.innerHTML = "<p>⏳ Uploading...</p>";
 
     try {
       const res = await fetch("/upload", { method: "POST", body: fd });
-      const data = await res.json();
+      let data = await res.json();
       if (!res.ok) {
         uploadResponse.innerHTML = `<p style='color:red;'>${data.error || "Upload failed"}</p>`;
         return;
       }
 
+      // Indexing runs in the background; poll until the job finishes
+      data = await waitForIndexing(data);
+      if (data.status === "error") {
+        uploadResponse.innerHTML = `<p style='color:red;'>Indexing failed: ${data.error || "unknown error"}</p>`;
+        return;
+      }
+
+      const filename = fileInput.files[0].name;
       uploadResponse.innerHTML = `
-        <p><strong>${data.message}</strong></p>
+        <p><strong>File ${escapeHtml(filename)} uploaded and indexed successfully!</strong></p>
         <p>Chunks indexed: ${data.chunk_count}</p>
-        <pre>${data.preview}</pre>`;
-      currentFile.textContent = data.filename;
+        <pre>${escapeHtml(data.preview || "")}</pre>`;
+      currentFile.textContent = filename;
       chatArea.style.display = "block";
       chatLog.innerHTML = "";
-      await loadChatHistory(data.filename);
+      await loadChatHistory(filename);
       await loadUserFiles();
       if (isMobile()) hideSidebar();
     } catch (err) {
@@ -200,6 +208,18 @@ document.addEventListener("DOMContentLoaded", () => {
     }
   });
 
+  async function waitForIndexing(job, interval = 700) {
+    while (job.status === "queued" || job.status === "running") {
+      const stage = job.status === "queued" ? "queued" : job.stage;
+      uploadResponse.innerHTML = `<p>⏳ Indexing (${stage})... ${Math.round(job.percent || 0)}%</p>`;
+      await new Promise((r) => setTimeout(r, interval));
+      const res = await fetch(`/upload/status/${job.job_id}`, { cache: "no-store" });
+      if (!res.ok) throw new Error("Lost track of the indexing job.");
+      job = await res.json();
+    }
+    return job;
+  }
+
   // ==================================================
   // 🧾 LOAD CHAT HISTORY
   // ==================================================
@@ -240,34 +260,80 @@ document.addEventListener("DOMContentLoaded", () => {
     questionInput.value = "";
     const thinking = appendChat("Assistant", "⏳ Thinking...");
 
-    // 🔥 fixed: no await blocking, immediate DOM update
-    fetch("/chat", {
+    streamChat({ filename, question: q }, thinking).catch((err) => {
+      removeElement(thinking);
+      appendChat("Assistant", `Error: ${err.message}`);
+    });
+  });
+
+  function showCitations(context, cached) {
+    if (!context?.context_used?.length) return;
+    const cites = context.context_used
+      .map((c, i) => `▸ [${i + 1}]${c.page ? ` p.${c.page}` : ""} score=${(c.score || 0).toFixed(4)}`)
+      .join("\n");
+    const label = cached
+      ? "Citations (cached answer)"
+      : `Citations (${context.prompt_tokens ?? "?"} prompt tokens)`;
+    const citeEl = appendChat("Assistant", `${label}:\n${cites}`);
+    citeEl.style.opacity = "0.7";
+  }
+
+  // Reads the /chat/stream Server-Sent Events and renders tokens as they arrive
+  async function streamChat(payload, thinking) {
+    const res = await fetch("/chat/stream", {
       method: "POST",
-      headers: { "Content-Type": "application/json", Connection: "close" },
-      body: JSON.stringify({ filename, question: q }),
-    })
-      .then((res) => res.json())
-      .then((data) => {
-        removeElement(thinking);
-        if (data.error) {
-          appendChat("Assistant", `Error: ${data.error}`);
-          return;
-        }
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify(payload),
+    });
+    if (!res.ok || !res.body) {
+      const data = await res.json().catch(() => ({}));
+      throw new Error(data.error || `Request failed (${res.status})`);
+    }
 
-        const msgEl = appendChat("Assistant", "");
-        typeEffect(msgEl.querySelector(".bubble-text"), data.answer || "[no answer]", 10);
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    let context = null;
+    let textEl = null;
 
-        if (data.context_used?.length) {
-          const cites = data.context_used
-            .map((c, i) => `▸ [${i + 1}] score=${(c.score || 0).toFixed(4)}`)
-            .join("\n");
-          const citeEl = appendChat("Assistant", `Citations:\n${cites}`);
-          citeEl.style.opacity = "0.7";
+    const handle = (event, data) => {
+      if (event === "context") {
+        context = data;
+      } else if (event === "token") {
+        if (!textEl) {
+          removeElement(thinking);
+          const msgEl = appendChat("Assistant", "");
+          if (context?.cached) msgEl.title = "Served from the answer cache";
+          textEl = msgEl.querySelector(".bubble-text");
         }
-      })
-      .catch((err) => {
+        textEl.textContent += data;
+        scrollToBottom();
+      } else if (event === "done") {
         removeElement(thinking);
-        appendChat("Assistant", `Error: ${err.message}`);
-      });
-  });
+        if (!textEl) appendChat("Assistant", data.answer || "[no answer]");
+        showCitations(context, data.cached);
+      } else if (event === "error") {
+        removeElement(thinking);
+        appendChat("Assistant", `Error: ${data.error}`);
+      }
+    };
+
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      let sep;
+      while ((sep = buffer.indexOf("\n\n")) !== -1) {
+        const raw = buffer.slice(0, sep);
+        buffer = buffer.slice(sep + 2);
+        let event = "message";
+        const dataLines = [];
+        raw.split("\n").forEach((line) => {
+          if (line.startsWith("event:")) event = line.slice(6).trim();
+          else if (line.startsWith("data:")) dataLines.push(line.slice(5).trim());
+        });
+        if (dataLines.length) handle(event, JSON.parse(dataLines.join("\n")));
+      }
+    }
+  }
 });
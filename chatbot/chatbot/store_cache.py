@@ -0,0 +1,144 @@
+# chatbot/store_cache.py
+import threading
+import time
+from collections import OrderedDict
+
+
+class StoreCache:
+    """
+    Memory-budgeted LRU/TTL cache of loaded VectorStores.
+
+    Entries are evicted least-recently-used first once the resident size
+    (`store.nbytes()`, plus anything `charge`d to the entry) exceeds
+    `max_bytes`, and after `ttl` idle seconds.
+    A miss calls `loader(key)`, which reloads the store from disk (or
+    returns None), so eviction is transparent to callers.
+    """
+
+    def __init__(self, loader, max_bytes, ttl=None, on_evict=None, logger=None):
+        self.loader = loader
+        self.max_bytes = max_bytes
+        self.ttl = ttl or None
+        self.on_evict = on_evict
+        self.logger = logger
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key → (store, nbytes, last_used)
+        self.bytes_resident = 0
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.evictions = 0
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        """Returns the store for `key`, loading it on a miss; None if unknown."""
+        with self._lock:
+            expired = self._expire()
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.hits += 1
+                self._entries[key] = (entry[0], entry[1], time.monotonic())
+                self._entries.move_to_end(key)
+            else:
+                self.misses += 1
+        self._notify(expired)
+        if entry is not None:
+            return entry[0]
+
+        store = self.loader(key)
+        if store is None:
+            return None
+        with self._lock:
+            self.loads += 1
+            # Another thread may have loaded the same key meanwhile.
+            if key in self._entries:
+                return self._entries[key][0]
+        return self.put(key, store)
+
+    def put(self, key, store):
+        """Inserts or replaces `key`, then evicts down to the memory budget."""
+        evicted = []
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes_resident -= old[1]
+            nbytes = store.nbytes()
+            self._entries[key] = (store, nbytes, time.monotonic())
+            self.bytes_resident += nbytes
+            evicted = self._shrink()
+        self._notify(evicted)
+        return store
+
+    def charge(self, key, nbytes):
+        """
+        Counts `nbytes` kept elsewhere on behalf of `key` (e.g. its copy in
+        the corpus index) against the budget until the entry is evicted.
+        Returns False if `key` is not resident.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False
+            self._entries[key] = (entry[0], entry[1] + nbytes, time.monotonic())
+            self._entries.move_to_end(key)
+            self.bytes_resident += nbytes
+            evicted = self._shrink()
+        self._notify(evicted)
+        return True
+
+    def pop(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.bytes_resident -= entry[1]
+        return entry[0] if entry else None
+
+    def _shrink(self):
+        """Evicts down to the memory budget, keeping at least the newest entry."""
+        evicted = []
+        while self.bytes_resident > self.max_bytes and len(self._entries) > 1:
+            evicted.append(self._evict_oldest())
+        evicted.extend(self._expire())
+        return evicted
+
+    def _evict_oldest(self):
+        key, (_, nbytes, _) = self._entries.popitem(last=False)
+        self.bytes_resident -= nbytes
+        self.evictions += 1
+        return key
+
+    def _expire(self):
+        """Drops entries idle for longer than `ttl`; returns their keys."""
+        expired = []
+        if not self.ttl:
+            return expired
+        cutoff = time.monotonic() - self.ttl
+        # Entries are kept in last-used order, so expired ones sit first.
+        while self._entries:
+            key, (_, _, last_used) = next(iter(self._entries.items()))
+            if last_used > cutoff:
+                break
+            expired.append(self._evict_oldest())
+        return expired
+
+    def _notify(self, keys):
+        for key in keys:
+            if self.logger:
+                self.logger.info(f"Evicted index {str(key)[:12]} from memory")
+            if self.on_evict:
+                self.on_evict(key)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes_resident": self.bytes_resident,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
@@ -1,33 +1,343 @@
+import json
+import os
+import sys
+
 import faiss
 import numpy as np
 
+from bm25 import TOKENIZER_VERSION, BM25Index
+from chunk_store import ChunkStore
+
+INDEX_FILE = "index.faiss"
+CHUNKS_FILE = "chunks.json"  # legacy chunk list, replaced by ChunkStore files
+CHUNK_META_FILE = "chunk_meta.json"
+META_FILE = "meta.json"
+
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq")
+
+# "ip": cosine similarity over L2-normalized vectors (higher is better).
+# "l2": raw Euclidean distance (lower is better); kept for older indexes.
+METRICS = {"ip": faiss.METRIC_INNER_PRODUCT, "l2": faiss.METRIC_L2}
+DEFAULT_METRIC = os.getenv("VECTOR_METRIC", "ip")
+
+# Search-time knobs for the approximate backends.
+DEFAULT_NPROBE = int(os.getenv("VECTOR_NPROBE", "16"))
+DEFAULT_EF_SEARCH = int(os.getenv("VECTOR_EF_SEARCH", "64"))
+
+
+def choose_index_type(n_vectors: int) -> str:
+    """
+    Picks a FAISS backend from the number of vectors: exact search while it
+    is cheap, HNSW for mid-sized sets, IVF once graph memory adds up, and
+    IVF-PQ when raw vectors no longer fit comfortably in RAM.
+    """
+    if n_vectors < 20_000:
+        return "flat"
+    if n_vectors < 200_000:
+        return "hnsw"
+    if n_vectors < 2_000_000:
+        return "ivf_flat"
+    return "ivf_pq"
+
+
+def _nlist_for(n_vectors: int) -> int:
+    """IVF list count: ~4·√n, but keep ≥39 training points per list."""
+    return max(1, min(int(4 * np.sqrt(n_vectors)), n_vectors // 39))
+
+
+def _pq_m_for(dim: int) -> int:
+    """Largest sub-quantizer count that divides `dim` with ≥4 dims each."""
+    for m in (64, 48, 32, 24, 16, 12, 8, 4, 2, 1):
+        if dim % m == 0 and dim // m >= 4:
+            return m
+    return 1
+
+
+def empty_index(dim: int, metric: str = DEFAULT_METRIC):
+    """Exact index for `metric`; the starting point of every VectorStore."""
+    return faiss.IndexFlatIP(dim) if metric == "ip" else faiss.IndexFlatL2(dim)
+
+
+def build_faiss_index(vectors, index_type: str, metric: str = "l2", train_size: int = 100_000, seed: int = 0):
+    """
+    Creates a FAISS index of `index_type` for `vectors` (float32, n × d),
+    training IVF quantizers on a random sample of at most `train_size` rows,
+    and adds all vectors in order so ids match chunk positions.
+    With metric "ip" the vectors are expected to be L2-normalized already.
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r}; expected one of {INDEX_TYPES}")
+    n, dim = vectors.shape
+    faiss_metric = METRICS[metric]
+
+    if index_type == "flat":
+        index = empty_index(dim, metric)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, 32, faiss_metric)
+        index.hnsw.efConstruction = 80
+    else:
+        nlist = _nlist_for(n)
+        quantizer = empty_index(dim, metric)
+        if index_type == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss_metric)
+        else:
+            # 8-bit codes need 256 centroids per sub-quantizer to train.
+            nbits = 8 if n >= 256 * 39 else 4
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, _pq_m_for(dim), nbits, faiss_metric)
+
+    if not index.is_trained:
+        rng = np.random.default_rng(seed)
+        sample = vectors
+        if n > train_size:
+            sample = vectors[rng.choice(n, size=train_size, replace=False)]
+        index.train(np.ascontiguousarray(sample))
+
+    if n:
+        index.add(vectors)
+    return index
+
+
+def set_search_params(index, nprobe: int = None, ef_search: int = None):
+    """Applies nprobe (IVF) / efSearch (HNSW) to an index, ignoring knobs it lacks."""
+    if nprobe is not None:
+        try:
+            faiss.extract_index_ivf(index).nprobe = nprobe
+        except RuntimeError:
+            pass
+    if ef_search is not None and hasattr(index, "hnsw"):
+        index.hnsw.efSearch = ef_search
+
+
 class VectorStore:
     """
     Simple FAISS-based vector store for semantic search.
     Stores text chunks and their embeddings for retrieval.
+
+    Vectors are collected in an exact (flat) index; `optimize()` can then
+    move them to an approximate backend (see INDEX_TYPES). In "ip" mode
+    vectors and queries are L2-normalized and scores are cosine similarities.
     """
 
-    def __init__(self, embedding_dim: int):
-        self.index = faiss.IndexFlatL2(embedding_dim)
-        self.chunks = []
+    def __init__(self, embedding_dim: int, metric: str = DEFAULT_METRIC):
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric {metric!r}; expected one of {tuple(METRICS)}")
+        self.embedding_dim = embedding_dim
+        self.metric = metric
+        self.index = empty_index(embedding_dim, metric)
+        self.index_type = "flat"
+        self.nprobe = DEFAULT_NPROBE
+        self.ef_search = DEFAULT_EF_SEARCH
+        self.chunks = ChunkStore()
+        self.lexical = BM25Index()
+        self.chunk_meta = []
+        self.metadata = {}
 
-    def add(self, chunks, embeddings):
+    def add(self, chunks, embeddings, metas=None):
         """
         Adds new text chunks and embeddings to the store.
+        `metas` optionally gives one dict per chunk (e.g. {"page": 3}),
+        which is returned alongside the chunk in search results.
         """
-        self.index.add(np.array(embeddings).astype('float32'))
+        self.index.add(self._prepare(embeddings))
         self.chunks.extend(chunks)
+        if self.lexical is not None:
+            self.lexical.add(chunks)
+        self.chunk_meta.extend(metas if metas is not None else [{} for _ in chunks])
+
+    def _prepare(self, vectors):
+        """float32 copy of `vectors`, normalized when searching by cosine."""
+        vectors = np.array(vectors, dtype="float32", ndmin=2)
+        if self.metric == "ip":
+            faiss.normalize_L2(vectors)
+        return vectors
+
+    def _ensure_direct_map(self):
+        """IVF indexes can only reconstruct vectors by id once they keep a direct map."""
+        if self.index_type in ("ivf_flat", "ivf_pq"):
+            ivf = faiss.extract_index_ivf(self.index)
+            if ivf.direct_map.no():
+                ivf.make_direct_map()
+
+    def vectors(self):
+        """All stored vectors in id order (lossy for IVF-PQ)."""
+        self._ensure_direct_map()
+        return self.index.reconstruct_n(0, self.index.ntotal)
 
-    def search(self, query_embedding, top_k=3):
+    def similarities(self, query_embedding, ids):
+        """
+        Scores stored vectors `ids` against one query the way `search` would:
+        cosine similarity for "ip", squared distance for "l2".
+        """
+        if not len(ids):
+            return []
+        query = self._prepare(query_embedding)[0]
+        self._ensure_direct_map()
+        vectors = np.vstack([self.index.reconstruct(int(i)) for i in ids])
+        if self.metric == "ip":
+            return (vectors @ query).tolist()
+        return ((vectors - query) ** 2).sum(axis=1).tolist()
+
+    def nbytes(self) -> int:
+        """Approximate resident size: index vectors/codes plus chunk text and metadata."""
+        n, dim = self.index.ntotal, self.embedding_dim
+        if self.index_type == "ivf_pq":
+            per_vector = faiss.extract_index_ivf(self.index).code_size + 8
+        elif self.index_type == "ivf_flat":
+            per_vector = dim * 4 + 8
+        elif self.index_type == "hnsw":
+            # Level-0 graph holds 2·M int32 neighbour ids per vector.
+            per_vector = dim * 4 + self.index.hnsw.nb_neighbors(0) * 4
+        else:
+            per_vector = dim * 4
+        meta = sum(sys.getsizeof(m) for m in self.chunk_meta)
+        lexical = self.lexical.nbytes() if self.lexical is not None else 0
+        return n * per_vector + self.chunks.nbytes() + meta + lexical
+
+    def optimize(self, index_type: str = "auto", train_size: int = 100_000):
+        """
+        Rebuilds the index with `index_type`, or one picked from the vector
+        count when "auto". Returns the backend in use afterwards.
+        """
+        if index_type == "auto":
+            index_type = choose_index_type(self.index.ntotal)
+        if index_type == self.index_type:
+            return index_type
+
+        self.index = build_faiss_index(self.vectors(), index_type, metric=self.metric, train_size=train_size)
+        self.index_type = index_type
+        self.set_search_params()
+        return index_type
+
+    def set_search_params(self, nprobe: int = None, ef_search: int = None):
+        """
+        Sets the recall/latency knobs of approximate backends:
+        `nprobe` IVF lists visited, `ef_search` HNSW candidate list size.
+        """
+        if nprobe is not None:
+            self.nprobe = nprobe
+        if ef_search is not None:
+            self.ef_search = ef_search
+        set_search_params(self.index, nprobe=self.nprobe, ef_search=self.ef_search)
+
+    def search_batch(self, query_embeddings, top_k=3, min_score=None):
+        """
+        Searches N query embeddings (N × dim) in one FAISS call.
+        Returns N ranked result lists. FAISS pads with id -1 when fewer than
+        `top_k` vectors are stored; those slots are dropped. In "ip" mode,
+        chunks scoring below `min_score` are dropped too.
+        """
+        queries = self._prepare(query_embeddings)
+        if self.index.ntotal == 0:
+            return [[] for _ in range(len(queries))]
+
+        distances, indices = self.index.search(queries, min(top_k, self.index.ntotal))
+        batch = []
+        for row_scores, row_ids in zip(distances, indices):
+            results = []
+            for score, idx in zip(row_scores, row_ids):
+                if idx < 0:
+                    continue
+                score = float(score)
+                if min_score is not None and self.metric == "ip" and score < min_score:
+                    continue
+                result = dict(self.chunk_meta[idx])
+                result.update({
+                    "chunk": self.chunks[idx],
+                    "score": score,
+                    "id": int(idx)
+                })
+                results.append(result)
+            batch.append(results)
+        return batch
+
+    def search(self, query_embedding, top_k=3, min_score=None):
         """
         Returns the top_k most similar text chunks to the query.
         """
-        query_embedding = np.array(query_embedding).astype('float32')
-        distances, indices = self.index.search(query_embedding, top_k)
+        return self.search_batch(query_embedding, top_k=top_k, min_score=min_score)[0]
+
+    def lexical_search(self, query: str, top_k=10, max_df=None):
+        """
+        BM25 keyword search over the chunk texts; finds exact identifiers,
+        error codes and part numbers that embeddings tend to blur. `max_df`
+        keeps only hits on a rare term (see `BM25Index.search`).
+        Returns [] for stores saved without a sparse index.
+        """
+        if self.lexical is None:
+            return []
         results = []
-        for i, idx in enumerate(indices[0]):
-            results.append({
-                "chunk": self.chunks[idx],
-                "score": float(distances[0][i])
-            })
+        for idx, score in self.lexical.search(query, top_k=top_k, max_df=max_df):
+            result = dict(self.chunk_meta[idx])
+            result.update({"chunk": self.chunks[idx], "score": score, "id": idx})
+            results.append(result)
         return results
+
+    def save(self, directory: str):
+        """
+        Writes the FAISS index, chunk list and metadata into `directory`.
+        The metadata file is written last, so a directory without it is
+        treated as an incomplete save by `exists()`.
+        """
+        os.makedirs(directory, exist_ok=True)
+        faiss.write_index(self.index, os.path.join(directory, INDEX_FILE))
+        self.chunks.save(directory)
+        if self.lexical is not None:
+            self.lexical.save(directory)
+        with open(os.path.join(directory, CHUNK_META_FILE), "w", encoding="utf-8") as f:
+            json.dump(self.chunk_meta, f)
+
+        meta = dict(self.metadata)
+        meta["embedding_dim"] = self.embedding_dim
+        meta["chunk_count"] = len(self.chunks)
+        meta["metric"] = self.metric
+        meta["index_type"] = self.index_type
+        meta["nprobe"] = self.nprobe
+        meta["ef_search"] = self.ef_search
+        tmp_path = os.path.join(directory, META_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, os.path.join(directory, META_FILE))
+
+    @staticmethod
+    def exists(directory: str) -> bool:
+        """
+        True if `directory` holds a complete saved store.
+        """
+        return os.path.exists(os.path.join(directory, META_FILE))
+
+    @classmethod
+    def load(cls, directory: str) -> "VectorStore":
+        """
+        Rebuilds a store previously written with `save()`.
+        """
+        with open(os.path.join(directory, META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        if ChunkStore.exists(directory):
+            chunks = ChunkStore.load(directory)
+        else:
+            with open(os.path.join(directory, CHUNKS_FILE), encoding="utf-8") as f:
+                chunks = ChunkStore(json.load(f))
+        chunk_meta = [{} for _ in chunks]
+        meta_path = os.path.join(directory, CHUNK_META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as f:
+                chunk_meta = json.load(f)
+
+        store = cls.__new__(cls)
+        store.embedding_dim = meta.pop("embedding_dim")
+        meta.pop("chunk_count", None)
+        store.index = faiss.read_index(os.path.join(directory, INDEX_FILE))
+        store.metric = meta.pop("metric", "l2")
+        store.index_type = meta.pop("index_type", "flat")
+        store.nprobe = meta.pop("nprobe", DEFAULT_NPROBE)
+        store.ef_search = meta.pop("ef_search", DEFAULT_EF_SEARCH)
+        store.set_search_params()
+        store.chunks = chunks
+        store.lexical = BM25Index.load(directory) if BM25Index.exists(directory) else None
+        if store.lexical is not None and store.lexical.tokenizer_version != TOKENIZER_VERSION:
+            # Saved with an older tokenizer: re-index the chunk texts in memory
+            store.lexical = BM25Index()
+            store.lexical.add(chunks)
+        store.chunk_meta = chunk_meta
+        store.metadata = meta
+        return store